@@ -146,7 +146,7 @@ async def analyze_url(
     """Analyze a single URL"""
     try:
         logger.info(f"Analyzing URL: {request.url}")
-        result = app.analyze_url(str(request.url), request.keyword)
+        result = await app.analyze_url(str(request.url), request.keyword)
         
         return APIResponse(
             success=result.get("success", False),
@@ -43,13 +43,13 @@ class SEOScraperApp:
         
         logger.info("SEO Scraper application initialized")
     
-    def analyze_url(self, url: str, keyword: str = None) -> Dict[str, Any]:
+    async def analyze_url(self, url: str, keyword: str = None) -> Dict[str, Any]:
         """Analyze a single URL"""
         logger.info(f"Analyzing URL: {url}")
         
         start_time = time.time()
         try:
-            result = self.scraper.analyze_comprehensive(url, keyword)
+            result = await self.scraper.analyze_comprehensive(url, keyword)
             response_time = time.time() - start_time
             
             if result:
@@ -228,7 +228,7 @@ async def main():
     
     try:
         if args.command == "analyze-url":
-            result = app.analyze_url(args.url, args.keyword)
+            result = await app.analyze_url(args.url, args.keyword)
             print(json.dumps(result, indent=2, default=str))
             
         elif args.command == "analyze-urls":
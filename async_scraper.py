@@ -144,6 +144,16 @@ class AsyncHTTPClient:
             except Exception as e:
                 logger.error(f"Request error for {url}: {e}")
                 return None
+    
+    async def get_many(self, urls: List[str], **kwargs) -> List[Optional[aiohttp.ClientResponse]]:
+        """Fetch URLs concurrently (up to max_concurrent in flight), in input order
+        
+        Failed fetches, including ones cancelled on their own, come back as None;
+        cancelling get_many() itself still raises CancelledError.
+        """
+        results = await asyncio.gather(*(self.get(url, **kwargs) for url in urls), return_exceptions=True)
+        # CancelledError is a BaseException, not an Exception
+        return [None if isinstance(result, BaseException) else result for result in results]
 
 class AsyncContentAnalyzer:
     """Async content analyzer for concurrent content processing"""
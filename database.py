@@ -3,23 +3,78 @@ Database utilities for SEO Scraper
 """
 import sqlite3
 import json
+import functools
 import logging
+import threading
+from contextlib import contextmanager
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
 from models import KeywordData, ContentData, CompetitorData, TechnicalSEOData, BacklinkData, SERPData
 
 logger = logging.getLogger(__name__)
 
+# Compact separators keep the stored JSON columns small
+_dumps = functools.partial(json.dumps, separators=(',', ':'))
+
 class DatabaseManager:
     """Manages SQLite database operations for SEO data"""
     
     def __init__(self, db_path: str):
         self.db_path = db_path
+        # "file:" paths are SQLite URIs, e.g. a shared in-memory database
+        self._uri = db_path.startswith('file:')
+        # Connection of the transaction open on the current thread, if any
+        self._local = threading.local()
         self.setup_database()
     
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection to the database"""
+        return sqlite3.connect(self.db_path, uri=self._uri)
+    
+    @contextmanager
+    def _connection(self):
+        """Yield the open transaction's connection, or a fresh one committed on exit"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        
+        conn = self._connect()
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+    
+    @contextmanager
+    def transaction(self):
+        """Group several operations into a single transaction, committed on exit
+        
+        Yields the transaction's connection for any raw statements that should
+        share it.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            # Nested use joins the outer transaction
+            yield conn
+            return
+        
+        conn = self._connect()
+        self._local.conn = conn
+        try:
+            conn.execute("BEGIN")
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            conn.close()
+    
     def setup_database(self):
         """Initialize SQLite database with complete schema"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Keywords table
@@ -127,16 +182,19 @@ class DatabaseManager:
             )
         ''')
         
+        # Timestamp indexes keep the cache-expiry cleanup from scanning whole tables
+        for table in ('keywords', 'content', 'serp_tracking'):
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_ts ON {table}(timestamp)")
+        
         conn.commit()
         conn.close()
         logger.info("Database schema initialized successfully")
     
     def get_cached_keyword_data(self, keyword: str, max_age_days: int = 7) -> Optional[KeywordData]:
         """Retrieve cached keyword data if available and fresh"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
             cursor.execute("SELECT * FROM keywords WHERE keyword = ?", (keyword,))
             cached = cursor.fetchone()
             
@@ -152,17 +210,14 @@ class DatabaseManager:
                     local_pack=json.loads(cached[8]),
                     timestamp=cached[9]
                 )
-        finally:
-            conn.close()
         
         return None
     
     def save_keyword_data(self, keyword_data: KeywordData):
         """Save keyword research data to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
             cursor.execute('''
                 INSERT OR REPLACE INTO keywords 
                 (keyword, search_volume, competition, difficulty_score, related_keywords, 
@@ -173,23 +228,19 @@ class DatabaseManager:
                 keyword_data.search_volume,
                 keyword_data.competition,
                 keyword_data.difficulty_score,
-                json.dumps(keyword_data.related_keywords),
-                json.dumps(keyword_data.people_also_ask),
+                _dumps(keyword_data.related_keywords),
+                _dumps(keyword_data.people_also_ask),
                 keyword_data.featured_snippet,
-                json.dumps(keyword_data.local_pack),
+                _dumps(keyword_data.local_pack),
                 keyword_data.timestamp
             ))
-            conn.commit()
             logger.info(f"Saved keyword data for: {keyword_data.keyword}")
-        finally:
-            conn.close()
     
     def get_cached_content_data(self, url: str, max_age_days: int = 1) -> Optional[ContentData]:
         """Retrieve cached content data if available and fresh"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
             cursor.execute("SELECT * FROM content WHERE url = ?", (url,))
             cached = cursor.fetchone()
             
@@ -212,17 +263,14 @@ class DatabaseManager:
                     mobile_friendly=cached[15],
                     timestamp=cached[16]
                 )
-        finally:
-            conn.close()
         
         return None
     
     def save_content_data(self, content_data: ContentData):
         """Save content analysis data to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
             cursor.execute('''
                 INSERT OR REPLACE INTO content 
                 (url, title, meta_description, h1_tags, h2_tags, h3_tags, word_count, 
@@ -231,25 +279,21 @@ class DatabaseManager:
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 content_data.url, content_data.title, content_data.meta_description,
-                json.dumps(content_data.h1_tags), json.dumps(content_data.h2_tags),
-                json.dumps(content_data.h3_tags), content_data.word_count,
-                json.dumps(content_data.keyword_density), content_data.reading_score,
-                json.dumps(content_data.internal_links), json.dumps(content_data.external_links),
-                json.dumps(content_data.images), json.dumps(content_data.schema_markup),
+                _dumps(content_data.h1_tags), _dumps(content_data.h2_tags),
+                _dumps(content_data.h3_tags), content_data.word_count,
+                _dumps(content_data.keyword_density), content_data.reading_score,
+                _dumps(content_data.internal_links), _dumps(content_data.external_links),
+                _dumps(content_data.images), _dumps(content_data.schema_markup),
                 content_data.page_speed_score, content_data.mobile_friendly,
                 content_data.timestamp
             ))
-            conn.commit()
             logger.info(f"Saved content data for: {content_data.url}")
-        finally:
-            conn.close()
     
     def save_competitor_data(self, competitor_data: CompetitorData):
         """Save competitor analysis data to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
             cursor.execute('''
                 INSERT OR REPLACE INTO competitors
                 (domain, top_pages, meta_titles, common_keywords, content_gaps,
@@ -257,27 +301,23 @@ class DatabaseManager:
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 competitor_data.domain,
-                json.dumps(competitor_data.top_pages),
-                json.dumps(competitor_data.meta_titles),
-                json.dumps(competitor_data.common_keywords),
-                json.dumps(competitor_data.content_gaps),
+                _dumps(competitor_data.top_pages),
+                _dumps(competitor_data.meta_titles),
+                _dumps(competitor_data.common_keywords),
+                _dumps(competitor_data.content_gaps),
                 competitor_data.backlink_count,
                 competitor_data.domain_authority,
                 competitor_data.avg_word_count,
-                json.dumps(competitor_data.content_types),
+                _dumps(competitor_data.content_types),
                 competitor_data.timestamp
             ))
-            conn.commit()
             logger.info(f"Saved competitor data for: {competitor_data.domain}")
-        finally:
-            conn.close()
     
     def save_technical_seo_data(self, technical_data: TechnicalSEOData):
         """Save technical SEO audit data to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
             cursor.execute('''
                 INSERT OR REPLACE INTO technical_seo
                 (url, page_title, meta_description, canonical_url, robots_meta,
@@ -292,19 +332,15 @@ class DatabaseManager:
                 technical_data.internal_links_count, technical_data.external_links_count,
                 technical_data.images_without_alt, technical_data.page_load_time,
                 technical_data.mobile_friendly, technical_data.ssl_certificate,
-                json.dumps(technical_data.structured_data), technical_data.timestamp
+                _dumps(technical_data.structured_data), technical_data.timestamp
             ))
-            conn.commit()
             logger.info(f"Saved technical SEO data for: {technical_data.url}")
-        finally:
-            conn.close()
     
     def save_serp_data(self, serp_data: SERPData):
         """Save SERP tracking data to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
             cursor.execute('''
                 INSERT INTO serp_tracking
                 (keyword, url, position, title, description, timestamp)
@@ -313,17 +349,28 @@ class DatabaseManager:
                 serp_data.keyword, serp_data.url, serp_data.position,
                 serp_data.title, serp_data.description, serp_data.timestamp
             ))
-            conn.commit()
             logger.info(f"Saved SERP data for keyword: {serp_data.keyword}")
-        finally:
-            conn.close()
+    
+    def save_serp_data_many(self, serp_rows: List[SERPData]):
+        """Save several SERP tracking rows with a single executemany"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.executemany('''
+                INSERT INTO serp_tracking
+                (keyword, url, position, title, description, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [
+                (row.keyword, row.url, row.position, row.title, row.description, row.timestamp)
+                for row in serp_rows
+            ])
+            logger.info(f"Saved {len(serp_rows)} SERP rows")
     
     def get_recent_serp_data(self, keyword: str, max_age_hours: int = 24) -> List[SERPData]:
         """Get recent SERP tracking data for a keyword"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
             cursor.execute("""
                 SELECT * FROM serp_tracking
                 WHERE keyword = ? AND timestamp >= datetime('now', '-{} hours')
@@ -341,22 +388,16 @@ class DatabaseManager:
                     timestamp=row[6]
                 ) for row in results
             ]
-        finally:
-            conn.close()
     
     def cleanup_old_data(self, days_to_keep: int = 30):
         """Remove old data from the database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
             cutoff_date = (datetime.now() - timedelta(days=days_to_keep)).isoformat()
             
             tables = ['keywords', 'content', 'competitors', 'technical_seo', 'serp_tracking']
             for table in tables:
                 cursor.execute(f"DELETE FROM {table} WHERE timestamp < ?", (cutoff_date,))
             
-            conn.commit()
             logger.info(f"Cleaned up data older than {days_to_keep} days")
-        finally:
-            conn.close()
@@ -16,7 +16,7 @@ async def main():
     try:
         # Example usage: analyze a single URL
         print("\n1. Analyzing single URL...")
-        result = scraper_app.analyze_url("https://example.com", "example keyword")
+        result = await scraper_app.analyze_url("https://example.com", "example keyword")
         print(f"Result: {result.get('success', False)}")
 
         # Example batch processing - asynchronously
@@ -4,11 +4,12 @@ Advanced monitoring and logging system for SEO Scraper
 import logging
 import time
 import os
-import json
 import psutil
+import sqlite3
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
+from operator import attrgetter
 from threading import Lock
 import threading
 import smtplib
@@ -84,24 +85,35 @@ def setup_logging(log_level: str = "INFO", log_dir: str = "logs"):
 @dataclass
 class SystemMetrics:
     """System performance metrics"""
-    timestamp: str
+    timestamp: float  # epoch seconds
     cpu_usage: float
     memory_usage: float
     disk_usage: float
-    network_io: Dict[str, int]
+    bytes_sent: int
+    bytes_recv: int
     active_tasks: int
     database_size: float
+    
+    @property
+    def iso_timestamp(self) -> str:
+        """Timestamp formatted for display"""
+        return datetime.fromtimestamp(self.timestamp).isoformat()
 
 @dataclass
 class ScrapingMetrics:
     """Scraping-specific metrics"""
-    timestamp: str
+    timestamp: float  # epoch seconds
     urls_processed: int
     keywords_analyzed: int
     errors_count: int
     success_rate: float
     avg_response_time: float
     cache_hit_rate: float
+    
+    @property
+    def iso_timestamp(self) -> str:
+        """Timestamp formatted for display"""
+        return datetime.fromtimestamp(self.timestamp).isoformat()
 
 @dataclass
 class Alert:
@@ -115,6 +127,20 @@ class Alert:
     resolved: bool = False
     resolved_at: Optional[str] = None
 
+# Column definitions of the metrics tables; timestamps are epoch seconds
+_METRICS_TABLES = {
+    'system_metrics': (
+        "id INTEGER PRIMARY KEY, timestamp REAL, cpu_usage REAL, memory_usage REAL, "
+        "disk_usage REAL, bytes_sent INTEGER, bytes_recv INTEGER, active_tasks INTEGER, "
+        "database_size REAL"
+    ),
+    'scraping_metrics': (
+        "id INTEGER PRIMARY KEY, timestamp REAL, urls_processed INTEGER, "
+        "keywords_analyzed INTEGER, errors_count INTEGER, success_rate REAL, "
+        "avg_response_time REAL, cache_hit_rate REAL"
+    ),
+}
+
 class MetricsCollector:
     """Collects and stores system and application metrics"""
     
@@ -127,54 +153,98 @@ class MetricsCollector:
         self.collection_interval = 60  # seconds
         self.is_collecting = False
         self.collection_thread = None
+        self._alert_manager = None  # set by AlertManager.start_monitoring
+        
+        # Rolling retention window for stored metrics
+        self._retention_days = 30
+        self._prune_interval = 24 * 3600  # seconds
+        self._last_prune = 0.0
         
         # Metrics counters
         self.urls_processed = 0
         self.keywords_analyzed = 0
         self.errors_count = 0
-        self.response_times: List[float] = []
+        # Running response-time totals since the last collection tick
+        self._resp_sum = 0.0
+        self._resp_count = 0
         self.cache_hits = 0
         self.cache_misses = 0
         
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = Lock()
         self.setup_metrics_storage()
     
     def setup_metrics_storage(self):
-        """Initialize metrics storage"""
-        import sqlite3
-        
-        conn = sqlite3.connect(self.db_path)
+        """Initialize metrics storage and open the persistent connection"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        # Must precede table creation to take effect on a new database
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("PRAGMA mmap_size = 268435456")  # 256MB
+        conn.execute("PRAGMA cache_size = -16000")  # 16MB
         cursor = conn.cursor()
         
-        # System metrics table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS system_metrics (
-                id INTEGER PRIMARY KEY,
-                timestamp TEXT,
-                cpu_usage REAL,
-                memory_usage REAL,
-                disk_usage REAL,
-                network_io TEXT,
-                active_tasks INTEGER,
-                database_size REAL
-            )
-        ''')
-        
-        # Scraping metrics table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS scraping_metrics (
-                id INTEGER PRIMARY KEY,
-                timestamp TEXT,
-                urls_processed INTEGER,
-                keywords_analyzed INTEGER,
-                errors_count INTEGER,
-                success_rate REAL,
-                avg_response_time REAL,
-                cache_hit_rate REAL
-            )
-        ''')
+        for table, columns in _METRICS_TABLES.items():
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+            self._migrate_text_timestamps(cursor, table, columns)
         
+        # Older databases stored network I/O as a JSON blob
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(system_metrics)")}
+        for column in ('bytes_sent', 'bytes_recv'):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE system_metrics ADD COLUMN {column} INTEGER")
+        
+        # Dashboards query recent time ranges
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_system_metrics_timestamp ON system_metrics(timestamp)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_scraping_metrics_timestamp ON scraping_metrics(timestamp)")
+        
+        conn.commit()
+        self._conn = conn
+    
+    @staticmethod
+    def _migrate_text_timestamps(cursor: sqlite3.Cursor, table: str, columns: str):
+        """Rebuild a table created with ISO TEXT timestamps to hold REAL epoch seconds
+        
+        CREATE TABLE IF NOT EXISTS leaves an old table's TEXT affinity in place, which
+        would store new epoch values as text and make the pruning comparison lexical.
+        """
+        old_columns = {row[1]: row[2] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        if old_columns.get('timestamp', '').upper() != 'TEXT':
+            return
+        
+        new_columns = [column.split()[0] for column in columns.split(',')]
+        select = []
+        for column in new_columns:
+            if column == 'timestamp':
+                # ISO strings were written from datetime.now(), i.e. local time; rows that
+                # don't parse get 0 so the next prune clears them
+                select.append(
+                    "CASE WHEN typeof(timestamp) = 'text' "
+                    "THEN COALESCE(CAST(strftime('%s', timestamp, 'utc') AS REAL), 0) "
+                    "ELSE timestamp END"
+                )
+            elif column in old_columns:
+                select.append(column)
+            elif column in ('bytes_sent', 'bytes_recv') and 'network_io' in old_columns:
+                select.append(f"json_extract(network_io, '$.{column}')")
+            else:
+                select.append("NULL")
+        
+        # One transaction, so an interrupted rebuild leaves the old table untouched
+        conn = cursor.connection
+        cursor.execute("BEGIN")
+        try:
+            cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+            cursor.execute(f"CREATE TABLE {table} ({columns})")
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(new_columns)}) "
+                f"SELECT {', '.join(select)} FROM {table}_old"
+            )
+            cursor.execute(f"DROP TABLE {table}_old")
+        except Exception:
+            conn.rollback()
+            raise
         conn.commit()
-        conn.close()
+        logging.info(f"Migrated {table} timestamps to epoch seconds")
     
     def start_collection(self):
         """Start metrics collection"""
@@ -197,14 +267,27 @@ class MetricsCollector:
         """Main metrics collection loop"""
         while self.is_collecting:
             try:
-                self._collect_system_metrics()
-                self._collect_scraping_metrics()
+                system_metrics = self._collect_system_metrics()
+                scraping_metrics = self._collect_scraping_metrics()
+                
+                # Evaluate alerts against the snapshot we just collected; after a failed
+                # collection the previous snapshot is stale and would re-raise old alerts
+                alert_manager = self._alert_manager
+                if alert_manager is not None:
+                    if system_metrics is not None:
+                        alert_manager._check_system_alerts(system_metrics)
+                    if scraping_metrics is not None:
+                        alert_manager._check_scraping_alerts(scraping_metrics)
+                
+                if time.time() - self._last_prune >= self._prune_interval:
+                    self.prune_old_metrics()
+                
                 time.sleep(self.collection_interval)
             except Exception as e:
                 logging.error(f"Error collecting metrics: {e}")
                 time.sleep(5)
     
-    def _collect_system_metrics(self):
+    def _collect_system_metrics(self) -> Optional[SystemMetrics]:
         """Collect system performance metrics"""
         try:
             # CPU usage
@@ -220,10 +303,6 @@ class MetricsCollector:
             
             # Network I/O
             network = psutil.net_io_counters()
-            network_io = {
-                'bytes_sent': network.bytes_sent,
-                'bytes_recv': network.bytes_recv
-            }
             
             # Database size
             database_size = 0
@@ -231,11 +310,12 @@ class MetricsCollector:
                 database_size = os.path.getsize(config.db_path) / (1024 * 1024)  # MB
             
             metrics = SystemMetrics(
-                timestamp=datetime.now().isoformat(),
+                timestamp=time.time(),
                 cpu_usage=cpu_usage,
                 memory_usage=memory_usage,
                 disk_usage=disk_usage,
-                network_io=network_io,
+                bytes_sent=network.bytes_sent,
+                bytes_recv=network.bytes_recv,
                 active_tasks=threading.active_count(),
                 database_size=database_size
             )
@@ -247,11 +327,13 @@ class MetricsCollector:
                     self.system_metrics.pop(0)
             
             self._save_system_metrics(metrics)
+            return metrics
             
         except Exception as e:
             logging.error(f"Error collecting system metrics: {e}")
+            return None
     
-    def _collect_scraping_metrics(self):
+    def _collect_scraping_metrics(self) -> Optional[ScrapingMetrics]:
         """Collect scraping performance metrics"""
         try:
             with self.metrics_lock:
@@ -260,14 +342,14 @@ class MetricsCollector:
                 success_rate = ((total_requests - self.errors_count) / total_requests * 100) if total_requests > 0 else 100
                 
                 # Calculate average response time
-                avg_response_time = sum(self.response_times) / len(self.response_times) if self.response_times else 0
+                avg_response_time = self._resp_sum / self._resp_count if self._resp_count else 0
                 
                 # Calculate cache hit rate
                 total_cache_requests = self.cache_hits + self.cache_misses
                 cache_hit_rate = (self.cache_hits / total_cache_requests * 100) if total_cache_requests > 0 else 0
                 
                 metrics = ScrapingMetrics(
-                    timestamp=datetime.now().isoformat(),
+                    timestamp=time.time(),
                     urls_processed=self.urls_processed,
                     keywords_analyzed=self.keywords_analyzed,
                     errors_count=self.errors_count,
@@ -282,37 +364,35 @@ class MetricsCollector:
                     self.scraping_metrics.pop(0)
                 
                 # Reset counters (keep running totals in database)
-                self.response_times.clear()
+                self._resp_sum = 0.0
+                self._resp_count = 0
             
             self._save_scraping_metrics(metrics)
+            return metrics
             
         except Exception as e:
             logging.error(f"Error collecting scraping metrics: {e}")
+            return None
     
     def _save_system_metrics(self, metrics: SystemMetrics):
         """Save system metrics to database"""
         try:
-            import sqlite3
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO system_metrics 
-                (timestamp, cpu_usage, memory_usage, disk_usage, network_io, active_tasks, database_size)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                metrics.timestamp,
-                metrics.cpu_usage,
-                metrics.memory_usage,
-                metrics.disk_usage,
-                json.dumps(metrics.network_io),
-                metrics.active_tasks,
-                metrics.database_size
-            ))
-            
-            conn.commit()
-            conn.close()
+            with self._db_lock:
+                self._conn.execute('''
+                    INSERT INTO system_metrics 
+                    (timestamp, cpu_usage, memory_usage, disk_usage, bytes_sent, bytes_recv, active_tasks, database_size)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    metrics.timestamp,
+                    metrics.cpu_usage,
+                    metrics.memory_usage,
+                    metrics.disk_usage,
+                    metrics.bytes_sent,
+                    metrics.bytes_recv,
+                    metrics.active_tasks,
+                    metrics.database_size
+                ))
+                self._conn.commit()
             
         except Exception as e:
             logging.error(f"Error saving system metrics: {e}")
@@ -320,43 +400,52 @@ class MetricsCollector:
     def _save_scraping_metrics(self, metrics: ScrapingMetrics):
         """Save scraping metrics to database"""
         try:
-            import sqlite3
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO scraping_metrics 
-                (timestamp, urls_processed, keywords_analyzed, errors_count, success_rate, avg_response_time, cache_hit_rate)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                metrics.timestamp,
-                metrics.urls_processed,
-                metrics.keywords_analyzed,
-                metrics.errors_count,
-                metrics.success_rate,
-                metrics.avg_response_time,
-                metrics.cache_hit_rate
-            ))
-            
-            conn.commit()
-            conn.close()
+            with self._db_lock:
+                self._conn.execute('''
+                    INSERT INTO scraping_metrics 
+                    (timestamp, urls_processed, keywords_analyzed, errors_count, success_rate, avg_response_time, cache_hit_rate)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    metrics.timestamp,
+                    metrics.urls_processed,
+                    metrics.keywords_analyzed,
+                    metrics.errors_count,
+                    metrics.success_rate,
+                    metrics.avg_response_time,
+                    metrics.cache_hit_rate
+                ))
+                self._conn.commit()
             
         except Exception as e:
             logging.error(f"Error saving scraping metrics: {e}")
     
+    def prune_old_metrics(self):
+        """Delete stored metrics older than the retention window"""
+        cutoff = time.time() - self._retention_days * 86400
+        try:
+            with self._db_lock:
+                self._conn.execute("DELETE FROM system_metrics WHERE timestamp < ?", (cutoff,))
+                self._conn.execute("DELETE FROM scraping_metrics WHERE timestamp < ?", (cutoff,))
+                self._conn.commit()
+                self._conn.execute("PRAGMA incremental_vacuum").fetchall()
+            self._last_prune = time.time()
+        except Exception as e:
+            logging.error(f"Error pruning old metrics: {e}")
+    
     # Methods to record events
     def record_url_processed(self, response_time: float):
         """Record a URL processing event"""
         with self.metrics_lock:
             self.urls_processed += 1
-            self.response_times.append(response_time)
+            self._resp_sum += response_time
+            self._resp_count += 1
     
     def record_keyword_analyzed(self, response_time: float):
         """Record a keyword analysis event"""
         with self.metrics_lock:
             self.keywords_analyzed += 1
-            self.response_times.append(response_time)
+            self._resp_sum += response_time
+            self._resp_count += 1
     
     def record_error(self):
         """Record an error event"""
@@ -387,8 +476,8 @@ class AlertManager:
             'success_rate_low': 90.0  # below this is bad
         }
         self.is_monitoring = False
-        self.monitoring_thread = None
         self.email_config = None
+        self._compile_checks()
     
     def configure_email_alerts(self, smtp_server: str, smtp_port: int, 
                              username: str, password: str, recipients: List[str]):
@@ -401,77 +490,68 @@ class AlertManager:
             'recipients': recipients
         }
     
+    def configure_thresholds(self, **thresholds: float):
+        """Update alert thresholds; unknown metric names raise ValueError"""
+        unknown = thresholds.keys() - self.alert_thresholds.keys()
+        if unknown:
+            raise ValueError(f"Unknown alert thresholds: {', '.join(sorted(unknown))}")
+        # Convert before updating so a bad value leaves the thresholds unchanged
+        self.alert_thresholds.update({name: float(value) for name, value in thresholds.items()})
+        self._compile_checks()
+    
+    def _compile_checks(self):
+        """Bind the current thresholds into the per-tick check tables"""
+        thresholds = self.alert_thresholds
+        self._system_checks = [
+            (attrgetter('cpu_usage'), float(thresholds['cpu_usage']), 'warning', "High CPU usage: {:.1f}%"),
+            (attrgetter('memory_usage'), float(thresholds['memory_usage']), 'warning', "High memory usage: {:.1f}%"),
+            (attrgetter('disk_usage'), float(thresholds['disk_usage']), 'critical', "High disk usage: {:.1f}%"),
+        ]
+        self._success_rate_low = float(thresholds['success_rate_low'])
+        self._error_rate_high = float(thresholds['error_rate'])
+    
     def start_monitoring(self):
-        """Start alert monitoring"""
+        """Start alert monitoring
+        
+        Alerts are evaluated by the metrics collector's loop right after each
+        collection, so no separate polling thread is needed.
+        """
         if self.is_monitoring:
             return
         
         self.is_monitoring = True
-        self.monitoring_thread = threading.Thread(target=self._monitor_alerts, daemon=True)
-        self.monitoring_thread.start()
+        self.metrics_collector._alert_manager = self
         logging.info("Alert monitoring started")
     
     def stop_monitoring(self):
         """Stop alert monitoring"""
         self.is_monitoring = False
-        if self.monitoring_thread:
-            self.monitoring_thread.join(timeout=5)
+        if self.metrics_collector._alert_manager is self:
+            self.metrics_collector._alert_manager = None
         logging.info("Alert monitoring stopped")
     
-    def _monitor_alerts(self):
-        """Main alert monitoring loop"""
-        while self.is_monitoring:
-            try:
-                self._check_system_alerts()
-                self._check_scraping_alerts()
-                time.sleep(30)  # Check every 30 seconds
-            except Exception as e:
-                logging.error(f"Error in alert monitoring: {e}")
-                time.sleep(5)
-    
-    def _check_system_alerts(self):
+    def _check_system_alerts(self, latest_metrics: Optional[SystemMetrics] = None):
         """Check for system-related alerts"""
-        if not self.metrics_collector.system_metrics:
-            return
-        
-        latest_metrics = self.metrics_collector.system_metrics[-1]
-        
-        # Check CPU usage
-        if latest_metrics.cpu_usage > self.alert_thresholds['cpu_usage']:
-            self._create_alert(
-                'warning',
-                'system',
-                f"High CPU usage: {latest_metrics.cpu_usage:.1f}%",
-                'metrics_collector'
-            )
-        
-        # Check memory usage
-        if latest_metrics.memory_usage > self.alert_thresholds['memory_usage']:
-            self._create_alert(
-                'warning',
-                'system',
-                f"High memory usage: {latest_metrics.memory_usage:.1f}%",
-                'metrics_collector'
-            )
-        
-        # Check disk usage
-        if latest_metrics.disk_usage > self.alert_thresholds['disk_usage']:
-            self._create_alert(
-                'critical',
-                'system',
-                f"High disk usage: {latest_metrics.disk_usage:.1f}%",
-                'metrics_collector'
-            )
-    
-    def _check_scraping_alerts(self):
+        if latest_metrics is None:
+            if not self.metrics_collector.system_metrics:
+                return
+            latest_metrics = self.metrics_collector.system_metrics[-1]
+        
+        # Check CPU, memory and disk usage
+        for get_value, threshold, level, template in self._system_checks:
+            value = get_value(latest_metrics)
+            if value > threshold:
+                self._create_alert(level, 'system', template.format(value), 'metrics_collector')
+    
+    def _check_scraping_alerts(self, latest_metrics: Optional[ScrapingMetrics] = None):
         """Check for scraping-related alerts"""
-        if not self.metrics_collector.scraping_metrics:
-            return
-        
-        latest_metrics = self.metrics_collector.scraping_metrics[-1]
+        if latest_metrics is None:
+            if not self.metrics_collector.scraping_metrics:
+                return
+            latest_metrics = self.metrics_collector.scraping_metrics[-1]
         
         # Check success rate
-        if latest_metrics.success_rate < self.alert_thresholds['success_rate_low']:
+        if latest_metrics.success_rate < self._success_rate_low:
             self._create_alert(
                 'error',
                 'scraping',
@@ -483,7 +563,7 @@ class AlertManager:
         total_requests = latest_metrics.urls_processed + latest_metrics.keywords_analyzed
         if total_requests > 0:
             error_rate = (latest_metrics.errors_count / total_requests) * 100
-            if error_rate > self.alert_thresholds['error_rate']:
+            if error_rate > self._error_rate_high:
                 self._create_alert(
                     'error',
                     'scraping',
@@ -570,12 +650,23 @@ class AlertManager:
         """Get all alerts"""
         return self.alerts.copy()
 
+# Health status names indexed by severity
+HEALTH_STATUSES = ('healthy', 'warning', 'critical')
+
+# (value getter, warning above, critical above, label) for system resources
+SYSTEM_HEALTH_CHECKS = [
+    (attrgetter('cpu_usage'), 80, 90, "CPU usage"),
+    (attrgetter('memory_usage'), 85, 95, "Memory usage"),
+]
+
 class HealthChecker:
     """System health checker"""
     
     def __init__(self, metrics_collector: MetricsCollector, alert_manager: AlertManager):
         self.metrics_collector = metrics_collector
         self.alert_manager = alert_manager
+        self._db_conn: Optional[sqlite3.Connection] = None
+        self._db_lock = Lock()
     
     def check_health(self) -> Dict[str, Any]:
         """Perform comprehensive health check"""
@@ -617,26 +708,20 @@ class HealthChecker:
         
         latest = self.metrics_collector.system_metrics[-1]
         
-        status = 'healthy'
+        severity = 0
         issues = []
         
-        if latest.cpu_usage > 90:
-            status = 'critical'
-            issues.append(f"CPU usage critical: {latest.cpu_usage:.1f}%")
-        elif latest.cpu_usage > 80:
-            status = 'warning'
-            issues.append(f"CPU usage high: {latest.cpu_usage:.1f}%")
-        
-        if latest.memory_usage > 95:
-            status = 'critical'
-            issues.append(f"Memory usage critical: {latest.memory_usage:.1f}%")
-        elif latest.memory_usage > 85:
-            if status != 'critical':
-                status = 'warning'
-            issues.append(f"Memory usage high: {latest.memory_usage:.1f}%")
+        for get_value, warning, critical, label in SYSTEM_HEALTH_CHECKS:
+            value = get_value(latest)
+            if value > critical:
+                severity = 2
+                issues.append(f"{label} critical: {value:.1f}%")
+            elif value > warning:
+                severity = max(severity, 1)
+                issues.append(f"{label} high: {value:.1f}%")
         
         return {
-            'status': status,
+            'status': HEALTH_STATUSES[severity],
             'cpu_usage': latest.cpu_usage,
             'memory_usage': latest.memory_usage,
             'disk_usage': latest.disk_usage,
@@ -649,26 +734,27 @@ class HealthChecker:
             return {'status': 'unknown', 'message': 'No metrics available'}
         
         latest = self.metrics_collector.scraping_metrics[-1]
+        success_rate = latest.success_rate
+        avg_response_time = latest.avg_response_time
         
-        status = 'healthy'
+        severity = 0
         issues = []
         
-        if latest.success_rate < 80:
-            status = 'critical'
-            issues.append(f"Success rate critical: {latest.success_rate:.1f}%")
-        elif latest.success_rate < 90:
-            status = 'warning'
-            issues.append(f"Success rate low: {latest.success_rate:.1f}%")
+        if success_rate < 80:
+            severity = 2
+            issues.append(f"Success rate critical: {success_rate:.1f}%")
+        elif success_rate < 90:
+            severity = 1
+            issues.append(f"Success rate low: {success_rate:.1f}%")
         
-        if latest.avg_response_time > 10:
-            if status != 'critical':
-                status = 'warning'
-            issues.append(f"Slow response time: {latest.avg_response_time:.1f}s")
+        if avg_response_time > 10:
+            severity = max(severity, 1)
+            issues.append(f"Slow response time: {avg_response_time:.1f}s")
         
         return {
-            'status': status,
-            'success_rate': latest.success_rate,
-            'avg_response_time': latest.avg_response_time,
+            'status': HEALTH_STATUSES[severity],
+            'success_rate': success_rate,
+            'avg_response_time': avg_response_time,
             'cache_hit_rate': latest.cache_hit_rate,
             'issues': issues
         }
@@ -676,14 +762,17 @@ class HealthChecker:
     def _check_database_health(self) -> Dict[str, Any]:
         """Check database health"""
         try:
-            import sqlite3
-            
-            # Test database connection
-            conn = sqlite3.connect(config.db_path, timeout=5)
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
-            conn.close()
+            # Probe the database over a connection kept open between checks
+            with self._db_lock:
+                if self._db_conn is None:
+                    self._db_conn = sqlite3.connect(config.db_path, timeout=5, check_same_thread=False)
+                try:
+                    self._db_conn.execute("SELECT 1").fetchone()
+                except sqlite3.Error:
+                    # Reconnect on the next check
+                    self._db_conn.close()
+                    self._db_conn = None
+                    raise
             
             # Check database size
             db_size = os.path.getsize(config.db_path) / (1024 * 1024)  # MB
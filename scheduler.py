@@ -2,16 +2,21 @@
 Task scheduling and automation system for SEO Scraper
 """
 import asyncio
-import schedule
+import concurrent.futures
+import functools
 import logging
 import threading
 import time
+import heapq
 import json
-from typing import Dict, List, Optional, Callable, Any
+import math
+import pickle
+from collections import defaultdict, deque
+from statistics import NormalDist, StatisticsError
+from typing import Deque, Dict, List, Optional, Callable, Any, Tuple
 from datetime import datetime, timedelta
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, fields
 from enum import Enum
-import pickle
 import os
 
 from config import config
@@ -35,7 +40,7 @@ class TaskPriority(Enum):
     HIGH = 3
     CRITICAL = 4
 
-@dataclass
+@dataclass(slots=True)
 class ScheduledTask:
     """Represents a scheduled task"""
     id: str
@@ -57,19 +62,135 @@ class ScheduledTask:
     timeout: int = 3600  # 1 hour default timeout
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
+    retry_schedule: Optional[List[float]] = None  # seconds after first failure
+
+# Minimum completed runs of a task function before retries are placed adaptively
+MIN_DURATION_SAMPLES = 5
+
+def compute_retry_schedule(durations: List[float], max_retries: int,
+                           quantile: float = 0.99) -> Optional[List[float]]:
+    """
+    Place retry attempts using the observed run-time distribution
+    
+    Fits a lognormal to past durations and solves the optimal polling
+    recurrence L_i = (F(L_{i-1}) - F(L_{i-2})) / p(L_{i-1}) + L_{i-1} with
+    L_0 = 0, bisecting on L_1 so the last attempt lands on the given
+    quantile. Returns cumulative offsets in seconds, or None if the
+    durations can't be fitted.
+    """
+    if max_retries < 1 or len(durations) < MIN_DURATION_SAMPLES:
+        return None
+    
+    try:
+        dist = NormalDist.from_samples([math.log(max(d, 1e-3)) for d in durations])
+    except StatisticsError:
+        return None
+    if dist.stdev <= 0:
+        return None
+    
+    upper = math.exp(dist.inv_cdf(quantile))
+    
+    def cdf(t: float) -> float:
+        return dist.cdf(math.log(t)) if t > 0 else 0.0
+    
+    def pdf(t: float) -> float:
+        return dist.pdf(math.log(t)) / t if t > 0 else 0.0
+    
+    def poll_times(first: float) -> List[float]:
+        times = [0.0, first]
+        for _ in range(max_retries - 1):
+            density = pdf(times[-1])
+            if density <= 0:
+                return times + [math.inf]
+            times.append((cdf(times[-1]) - cdf(times[-2])) / density + times[-1])
+        return times[1:]
+    
+    low, high = 0.0, upper
+    for _ in range(60):
+        mid = (low + high) / 2
+        if poll_times(mid)[-1] > upper:
+            high = mid
+        else:
+            low = mid
+    
+    times = poll_times(low)
+    if not all(math.isfinite(t) for t in times):
+        return None
+    times[-1] = upper
+    return times
+
+TASK_FIELDS = fields(ScheduledTask)
+
+def _encode_task_value(value: Any) -> Any:
+    """JSON fallback for task fields and results"""
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+@functools.lru_cache(maxsize=256)
+def _parse_time_of_day(value: str) -> Tuple[int, int, int]:
+    """Parse an "HH:MM" or "HH:MM:SS" schedule value once into (hour, minute, second)"""
+    parts = [int(part) for part in value.split(':')]
+    if len(parts) not in (2, 3) or not (0 <= parts[0] < 24 and all(0 <= p < 60 for p in parts[1:])):
+        raise ValueError(f"Invalid time of day: {value!r}")
+    return parts[0], parts[1], parts[2] if len(parts) == 3 else 0
 
 class TaskScheduler:
     """Advanced task scheduler with persistence and monitoring"""
     
-    def __init__(self, db_manager: DatabaseManager, persist_file: str = "tasks.pkl"):
+    def __init__(self, db_manager: DatabaseManager, persist_file: str = "tasks.json"):
         self.db_manager = db_manager
         self.persist_file = persist_file
         self.tasks: Dict[str, ScheduledTask] = {}
-        self.running_tasks: Dict[str, asyncio.Task] = {}
-        self.scheduler_thread = None
+        # (-priority, created_at, task_id) entries; removed or replaced tasks
+        # leave stale entries that are dropped lazily
+        self._priority_heap: List[Tuple[int, str, str]] = []
+        self._heap_lock = threading.Lock()
+        self.running_tasks: Dict[str, asyncio.Future] = {}
         self.is_running = False
         self.performance_monitor = PerformanceMonitor()
         
+        # Tasks are timed and run as coroutines on one event loop: the caller's
+        # loop when started with `await start()`, otherwise a loop owned by the
+        # scheduler on a background thread. Each task has at most one pending
+        # fire and one pending retry timer.
+        self._handles: Dict[str, asyncio.TimerHandle] = {}
+        self._retry_handles: Dict[str, asyncio.TimerHandle] = {}
+        self._due: List[Tuple[str, bool]] = []  # fires that came due while stopped
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._owns_loop = False
+        self._loop_thread = None
+        self._pending_calls: List[Tuple[Callable, tuple]] = []  # queued until a loop is attached
+        
+        # Bulk URL analyses that fire together are merged into one batch
+        self.max_bulk_batch = 8
+        self._pending_bulk: Optional[asyncio.Queue] = None
+        self._bulk_worker_task: Optional[asyncio.Task] = None
+        
+        # Analysis components are created on first use and reused across fires
+        self._scraper: Optional[SEOScraper] = None
+        self._browser_manager_task: Optional[asyncio.Future] = None
+        
+        # Identical task fires that overlap share one in-flight run
+        self._inflight: Dict[Any, asyncio.Future] = {}
+        
+        # Recent successful run times per task function, used to place retries
+        self.retry_delay = 60  # seconds, used until enough run times are known
+        self._run_durations: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=100))
+        
+        # Task state changes mark tasks dirty; a background thread appends
+        # their current state to a log next to the snapshot in bursts, and the
+        # log is folded back into the snapshot every `compact_every` records
+        self.persist_delay = 0.05  # seconds
+        self.compact_every = 1000
+        self._dirty = threading.Event()
+        self._dirty_ids: set = set()
+        self._dirty_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._log_file = f"{persist_file}.log"
+        self._log_records = 0
+        self._open_log()
+        
         # Task function registry
         self.task_functions = {
             'analyze_url': self._analyze_url_task,
@@ -88,8 +209,12 @@ class TaskScheduler:
     
     def add_task(self, task: ScheduledTask) -> str:
         """Add a new scheduled task"""
+        # Reject a bad schedule (e.g. "25:00") before the task is stored or persisted
+        self._next_delay(task)
+        
         self.tasks[task.id] = task
-        self._save_tasks()
+        self._index_task(task)
+        self._mark_dirty(task.id)
         
         # Schedule the task based on its type
         self._schedule_task(task)
@@ -101,12 +226,13 @@ class TaskScheduler:
         """Remove a scheduled task"""
         if task_id in self.tasks:
             # Cancel if running
-            if task_id in self.running_tasks:
-                self.running_tasks[task_id].cancel()
-                del self.running_tasks[task_id]
+            running = self.running_tasks.pop(task_id, None)
+            if running is not None:
+                self._call_in_loop(running.cancel)
             
             del self.tasks[task_id]
-            self._save_tasks()
+            self._call_in_loop(self._disarm, task_id)
+            self._mark_dirty(task_id)
             logger.info(f"Removed task {task_id}")
             return True
         return False
@@ -116,25 +242,67 @@ class TaskScheduler:
         return self.tasks.get(task_id)
     
     def list_tasks(self, status: Optional[TaskStatus] = None) -> List[ScheduledTask]:
-        """List all tasks, optionally filtered by status"""
-        tasks = list(self.tasks.values())
-        if status:
-            tasks = [t for t in tasks if t.status == status]
-        return sorted(tasks, key=lambda x: x.priority.value, reverse=True)
+        """List all tasks by priority, optionally filtered by status"""
+        return self._by_priority(None, status)
     
-    def start_scheduler(self):
-        """Start the task scheduler"""
+    def peek_top(self, k: int, status: Optional[TaskStatus] = None) -> List[ScheduledTask]:
+        """Get the k highest-priority tasks, optionally filtered by status"""
+        return self._by_priority(k, status)
+    
+    def _index_task(self, task: ScheduledTask):
+        """Add a task to the priority index"""
+        with self._heap_lock:
+            heap = self._priority_heap
+            heapq.heappush(heap, (-task.priority.value, task.created_at, task.id))
+            # Rebuild from the live tasks once stale entries make up most of the index
+            if len(heap) > 2 * len(self.tasks) + 16:
+                heap[:] = [(-t.priority.value, t.created_at, t.id) for t in list(self.tasks.values())]
+                heapq.heapify(heap)
+    
+    def _by_priority(self, limit: Optional[int], status: Optional[TaskStatus]) -> List[ScheduledTask]:
+        """Read tasks off the priority index in order without modifying it"""
+        if limit is not None and limit <= 0:
+            return []
+        with self._heap_lock:
+            heap = self._priority_heap
+            # Stale or filtered-out entries can crowd the first k, so widen until enough are found
+            wanted = len(heap) if limit is None else limit
+            while True:
+                entries = sorted(heap) if wanted >= len(heap) else heapq.nsmallest(wanted, heap)
+                result = []
+                seen = set()
+                for entry in entries:
+                    task = self.tasks.get(entry[2])
+                    # Skip entries for removed or re-added tasks
+                    if (task is None or entry[2] in seen
+                            or entry[0] != -task.priority.value or entry[1] != task.created_at):
+                        continue
+                    seen.add(entry[2])
+                    if status is None or task.status == status:
+                        result.append(task)
+                        if len(result) == limit:
+                            return result
+                if wanted >= len(heap):
+                    return result
+                wanted *= 2
+    
+    async def start(self):
+        """Start the task scheduler on the running event loop"""
         if self.is_running:
             logger.warning("Scheduler is already running")
             return
         
+        if self._owns_loop:
+            raise RuntimeError("Scheduler was started on its own loop; use start_scheduler()")
+        if self._log.closed:
+            self._open_log()
+        self._attach_loop(asyncio.get_running_loop())
         self.is_running = True
-        self.scheduler_thread = threading.Thread(target=self._run_scheduler, daemon=True)
-        self.scheduler_thread.start()
+        self._fire_due()
         logger.info("Task scheduler started")
     
-    def stop_scheduler(self):
-        """Stop the task scheduler"""
+    async def stop(self):
+        """Stop a task scheduler started with start()"""
         self.is_running = False
         
         # Cancel all running tasks
@@ -142,80 +310,228 @@ class TaskScheduler:
             task.cancel()
         self.running_tasks.clear()
         
-        if self.scheduler_thread:
-            self.scheduler_thread.join(timeout=5)
+        await self._stop_bulk_worker()
+        try:
+            await self._close_browser_manager()
+        except Exception as e:
+            logger.error(f"Failed to close browser manager: {e}")
         
+        self.close()
         logger.info("Task scheduler stopped")
     
-    def _run_scheduler(self):
-        """Main scheduler loop"""
-        while self.is_running:
+    def start_scheduler(self):
+        """Start the task scheduler on a background thread running its own loop"""
+        if self.is_running:
+            logger.warning("Scheduler is already running")
+            return
+        
+        if self._log.closed:
+            self._open_log()
+        self.is_running = True
+        self._start_loop()
+        self._call_in_loop(self._fire_due)
+        logger.info("Task scheduler started")
+    
+    def stop_scheduler(self):
+        """Stop the task scheduler"""
+        if self._loop is not None and not self._owns_loop:
+            # Started on the caller's loop: stop there, from another thread
+            asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result(timeout=15)
+            return
+        
+        self.is_running = False
+        
+        # Cancel all running tasks
+        for task in self.running_tasks.values():
+            self._loop.call_soon_threadsafe(task.cancel)
+        self.running_tasks.clear()
+        
+        if self._loop_thread:
             try:
-                schedule.run_pending()
-                time.sleep(1)
+                asyncio.run_coroutine_threadsafe(self._stop_bulk_worker(), self._loop).result(timeout=10)
             except Exception as e:
-                logger.error(f"Scheduler error: {e}")
-                time.sleep(5)
+                logger.error(f"Failed to stop bulk analysis worker: {e}")
+            try:
+                asyncio.run_coroutine_threadsafe(
+                    self._close_browser_manager(), self._loop
+                ).result(timeout=10)
+            except Exception as e:
+                logger.error(f"Failed to close browser manager: {e}")
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join(timeout=5)
+            self._loop_thread = None
+        
+        self.close()
+        logger.info("Task scheduler stopped")
+    
+    def close(self):
+        """Stop the persist thread, fold pending changes into the snapshot and close the log
+        
+        Called by stop() and stop_scheduler(); starting the scheduler again reopens the log.
+        """
+        if self._log.closed:
+            return
+        
+        self._persist_closing.set()
+        self._dirty.set()  # wake the thread so it sees the close
+        self._persist_thread.join()
+        
+        self._dirty.clear()
+        self._compact()
+        with self._save_lock:
+            self._log.close()
+    
+    def _start_loop(self):
+        """Run the scheduler's own event loop in a background thread if it isn't already"""
+        if self._loop is None:
+            self._owns_loop = True
+            self._attach_loop(asyncio.new_event_loop())
+        elif not self._owns_loop:
+            return
+        if self._loop_thread and self._loop_thread.is_alive():
+            return
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._loop_thread.start()
+    
+    def _attach_loop(self, loop: asyncio.AbstractEventLoop):
+        """Bind the scheduler to an event loop and hand it the calls queued so far"""
+        self._loop = loop
+        pending, self._pending_calls = self._pending_calls, []
+        for callback, args in pending:
+            loop.call_soon_threadsafe(callback, *args)
+    
+    def _call_in_loop(self, callback: Callable, *args):
+        """Run a callback on the scheduler's loop, directly if already on it"""
+        if self._loop is None:
+            self._pending_calls.append((callback, args))
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            callback(*args)
+        else:
+            self._loop.call_soon_threadsafe(callback, *args)
+    
+    def _next_delay(self, task: ScheduledTask) -> Optional[float]:
+        """Seconds until the task's next regular fire, or None for unknown schedule types"""
+        if task.schedule_type in ('once', 'daily'):
+            now = datetime.now()
+            hour, minute, second = _parse_time_of_day(task.schedule_value)
+            next_run = now.replace(hour=hour, minute=minute, second=second, microsecond=0)
+            if next_run <= now:
+                next_run += timedelta(days=1)
+            return (next_run - now).total_seconds()
+        if task.schedule_type == 'weekly':
+            return 7 * 24 * 3600.0
+        if task.schedule_type == 'interval':
+            return float(task.schedule_value)
+        return None
     
     def _schedule_task(self, task: ScheduledTask):
         """Schedule a task based on its schedule type"""
-        if task.schedule_type == 'once':
-            schedule.every().day.at(task.schedule_value).do(
-                self._execute_task_wrapper, task.id
-            ).tag(task.id)
-        elif task.schedule_type == 'daily':
-            schedule.every().day.at(task.schedule_value).do(
-                self._execute_task_wrapper, task.id
-            ).tag(task.id)
-        elif task.schedule_type == 'weekly':
-            schedule.every().week.do(
-                self._execute_task_wrapper, task.id
-            ).tag(task.id)
-        elif task.schedule_type == 'interval':
-            schedule.every(task.schedule_value).seconds.do(
-                self._execute_task_wrapper, task.id
-            ).tag(task.id)
-        
-        # Update next run time
-        job = schedule.get_jobs(task.id)
-        if job:
-            task.next_run = job[0].next_run.isoformat()
-            self._save_tasks()
+        delay = self._next_delay(task)
+        if delay is None:
+            return
+        
+        task.next_run = (datetime.now() + timedelta(seconds=delay)).isoformat()
+        self._mark_dirty(task.id)
+        self._call_in_loop(self._arm, task.id, delay)
     
-    def _execute_task_wrapper(self, task_id: str):
-        """Wrapper to execute tasks asynchronously"""
-        if task_id not in self.tasks:
+    def _arm(self, task_id: str, delay: float):
+        """Set the timer for a task's next regular fire, replacing any pending one"""
+        handle = self._handles.pop(task_id, None)
+        if handle is not None:
+            handle.cancel()
+        if task_id in self.tasks:
+            self._handles[task_id] = self._loop.call_later(delay, self._fire, task_id, True)
+    
+    def _disarm(self, task_id: str):
+        """Cancel all pending timers of a task"""
+        for handles in (self._handles, self._retry_handles):
+            handle = handles.pop(task_id, None)
+            if handle is not None:
+                handle.cancel()
+    
+    def _fire(self, task_id: str, regular: bool):
+        """Timer callback: start a task run on the loop"""
+        (self._handles if regular else self._retry_handles).pop(task_id, None)
+        if not self.is_running:
+            # Catch up once the scheduler is started again
+            self._due.append((task_id, regular))
+            return
+        self._loop.create_task(self._run_task(task_id))
+    
+    def _fire_due(self):
+        """Start the runs that came due while the scheduler was stopped"""
+        due, self._due = self._due, []
+        for task_id, regular in due:
+            self._fire(task_id, regular)
+    
+    async def _run_task(self, task_id: str):
+        """Run a task once; recurring tasks then re-arm their timer unless a retry is pending"""
+        task = self.tasks.get(task_id)
+        if task is None:
             return
         
-        task = self.tasks[task_id]
+        if task_id in self.running_tasks:
+            # A run started by hand is still going; it re-arms the timer when done
+            logger.info(f"Task {task_id} is already running, skipping this fire")
+            return
         
         # Check if task should run
         if task.max_runs and task.run_count >= task.max_runs:
             task.status = TaskStatus.COMPLETED
-            self._save_tasks()
+            self._mark_dirty(task_id)
             return
         
-        # Create async task
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
+        run = self._loop.create_task(self._execute_task(task_id))
+        self.running_tasks[task_id] = run
         try:
-            async_task = loop.create_task(self._execute_task(task_id))
-            self.running_tasks[task_id] = async_task
-            loop.run_until_complete(async_task)
+            await run
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+            logger.info(f"Task {task_id} was cancelled")
         except Exception as e:
             logger.error(f"Task execution error for {task_id}: {e}")
         finally:
-            loop.close()
-            if task_id in self.running_tasks:
+            if self.running_tasks.get(task_id) is run:
                 del self.running_tasks[task_id]
+        
+        # Recurring tasks are re-armed after the run so runs never overlap. A failed
+        # run leaves only its retry timer; the regular timer is re-armed once the
+        # retries are over, and a run started by hand keeps the timer already set.
+        if (task.schedule_type != 'once' and self.tasks.get(task_id) is task
+                and task_id not in self._handles and task_id not in self._retry_handles):
+            self._schedule_task(task)
+    
+    def _execute_task_wrapper(self, task_id: str):
+        """Run a task now from another thread and wait for it to finish"""
+        task = self.tasks.get(task_id)
+        if task is None:
+            return
+        
+        if self._loop is None:
+            self._start_loop()
+        future = asyncio.run_coroutine_threadsafe(self._run_task(task_id), self._loop)
+        try:
+            future.result(timeout=task.timeout + 5)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            logger.error(f"Task {task_id} did not finish within {task.timeout + 5}s")
+        except concurrent.futures.CancelledError:
+            logger.info(f"Task {task_id} was cancelled")
+        except Exception as e:
+            logger.error(f"Task execution error for {task_id}: {e}")
     
     async def _execute_task(self, task_id: str):
         """Execute a single task"""
         task = self.tasks[task_id]
         task.status = TaskStatus.RUNNING
         task.last_run = datetime.now().isoformat()
-        self._save_tasks()
+        self._mark_dirty(task_id)
         
         self.performance_monitor.start_timer(f"task_{task_id}")
         
@@ -226,16 +542,17 @@ class TaskScheduler:
             
             task_func = self.task_functions[task.function]
             
-            # Execute with timeout
-            result = await asyncio.wait_for(
-                task_func(*task.args, **task.kwargs),
-                timeout=task.timeout
-            )
+            # Execute with timeout, joining an identical run if one is in flight
+            result = await self._run_coalesced(task, task_func)
             
             task.result = result
             task.status = TaskStatus.COMPLETED
             task.run_count += 1
             task.retry_count = 0  # Reset retry count on success
+            task.retry_schedule = None
+            self._run_durations[task.function].append(
+                self.performance_monitor.end_timer(f"task_{task_id}")
+            )
             
             logger.info(f"Task '{task.name}' completed successfully")
             
@@ -250,35 +567,167 @@ class TaskScheduler:
             
             if task.retry_count <= task.max_retries:
                 task.status = TaskStatus.PENDING
-                logger.warning(f"Task '{task.name}' failed, retry {task.retry_count}/{task.max_retries}: {e}")
+                delay = self._schedule_retry(task)
+                logger.warning(f"Task '{task.name}' failed, retry {task.retry_count}/{task.max_retries} "
+                               f"in {delay:.1f}s: {e}")
             else:
                 task.status = TaskStatus.FAILED
                 logger.error(f"Task '{task.name}' failed permanently: {e}")
         
         finally:
-            self.performance_monitor.end_timer(f"task_{task_id}")
-            self._save_tasks()
+            if task.status != TaskStatus.COMPLETED:
+                self.performance_monitor.end_timer(f"task_{task_id}")
+            self._mark_dirty(task_id)
+    
+    async def _run_coalesced(self, task: ScheduledTask, task_func: Callable) -> Any:
+        """Run a task function, sharing the result with identical runs already in flight"""
+        try:
+            key = (task.function, json.dumps([task.args, task.kwargs], sort_keys=True,
+                                             default=_encode_task_value))
+        except TypeError:
+            key = id(task)
+        
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(task_func(*task.args, **task.kwargs))
+            self._inflight[key] = future
+            future.add_done_callback(
+                lambda f: self._inflight.pop(key) if self._inflight.get(key) is f else None
+            )
+            return await asyncio.wait_for(future, timeout=task.timeout)
+        
+        logger.info(f"Task '{task.name}' joined an identical run already in flight")
+        try:
+            # Shield so this waiter timing out doesn't cancel the shared run
+            return await asyncio.wait_for(asyncio.shield(future), timeout=task.timeout)
+        except asyncio.CancelledError:
+            # The shared run was cancelled by its owner rather than this waiter
+            if future.cancelled() and not asyncio.current_task().cancelling():
+                raise asyncio.TimeoutError()
+            raise
+    
+    def _schedule_retry(self, task: ScheduledTask) -> float:
+        """Schedule a one-off retry of a failed task and return its delay"""
+        if task.retry_count == 1:
+            task.retry_schedule = compute_retry_schedule(
+                list(self._run_durations[task.function]), task.max_retries
+            )
+        
+        if task.retry_schedule:
+            index = task.retry_count - 1
+            previous = task.retry_schedule[index - 1] if index > 0 else 0.0
+            delay = task.retry_schedule[index] - previous
+        else:
+            delay = self.retry_delay
+        
+        # The regular timer is dropped while retrying so a retry and a regular
+        # run never overlap; _run_task re-arms it when the retries are over
+        self._disarm(task.id)
+        self._retry_handles[task.id] = self._loop.call_later(delay, self._fire, task.id, False)
+        return delay
     
     # Task function implementations
     async def _analyze_url_task(self, url: str, keyword: str = None) -> Dict[str, Any]:
         """Task to analyze a single URL"""
-        scraper = SEOScraper(self.db_manager.db_path)
-        result = scraper.analyze_comprehensive(url, keyword)
+        if self._scraper is None:
+            self._scraper = SEOScraper(self.db_manager.db_path)
+        result = await self._scraper.analyze_comprehensive(url, keyword)
         return {"url": url, "success": result is not None}
     
     async def _analyze_keywords_task(self, keywords: List[str]) -> Dict[str, Any]:
         """Task to analyze multiple keywords"""
-        async with AsyncBrowserManager() as browser_manager:
-            analyzer = AsyncKeywordAnalyzer(self.db_manager, browser_manager)
-            results = await analyzer.analyze_multiple_keywords(keywords)
-            return {"keywords_analyzed": len(results), "total_keywords": len(keywords)}
+        browser_manager = await self._get_browser_manager()
+        analyzer = AsyncKeywordAnalyzer(self.db_manager, browser_manager)
+        results = await analyzer.analyze_multiple_keywords(keywords)
+        return {"keywords_analyzed": len(results), "total_keywords": len(keywords)}
+    
+    async def _get_browser_manager(self) -> AsyncBrowserManager:
+        """Start the shared browser manager on first use"""
+        if self._browser_manager_task is None:
+            self._browser_manager_task = asyncio.ensure_future(AsyncBrowserManager().__aenter__())
+        try:
+            # Shield so a cancelled caller doesn't abort the shared startup
+            return await asyncio.shield(self._browser_manager_task)
+        except Exception:
+            self._browser_manager_task = None
+            raise
+    
+    async def _close_browser_manager(self):
+        """Close the shared browser manager if it was started"""
+        task, self._browser_manager_task = self._browser_manager_task, None
+        if task is not None and task.done() and not task.cancelled() and task.exception() is None:
+            await task.result().close()
     
     async def _bulk_url_analysis_task(self, urls: List[str], keywords: List[str] = None) -> Dict[str, Any]:
         """Task for bulk URL analysis"""
-        analyzer = AsyncContentAnalyzer(self.db_manager)
-        results = await analyzer.analyze_multiple_urls(urls, keywords)
+        if self._bulk_worker_task is None or self._bulk_worker_task.done():
+            self._pending_bulk = asyncio.Queue()
+            self._bulk_worker_task = asyncio.ensure_future(self._bulk_worker())
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._pending_bulk.put((urls, keywords, future))
+        results = await future
         return {"urls_analyzed": len(results), "total_urls": len(urls)}
     
+    async def _bulk_worker(self):
+        """Merge queued bulk URL analyses and run them as a single batch"""
+        queue = self._pending_bulk
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.max_bulk_batch:
+                try:
+                    batch.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            
+            # Every request in the batch gets an answer, so no caller is left waiting
+            try:
+                await self._run_bulk_batch(batch)
+            except asyncio.CancelledError:
+                for _, _, future in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"Bulk URL analysis batch failed: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+    
+    async def _run_bulk_batch(self, batch: list):
+        """Run one batch of bulk URL analyses, one analyzer run per keyword set"""
+        # Requests can only share a run if they target the same keywords
+        groups: Dict[Tuple[str, ...], list] = defaultdict(list)
+        for item in batch:
+            groups[tuple(item[1] or ())].append(item)
+        
+        for keywords, items in groups.items():
+            merged_urls = list(dict.fromkeys(url for urls, _, _ in items for url in urls))
+            try:
+                analyzer = AsyncContentAnalyzer(self.db_manager)
+                results = await analyzer.analyze_multiple_urls(merged_urls, list(keywords) or None)
+            except Exception as e:
+                for _, _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            by_url = {result.url: result for result in results}
+            for urls, _, future in items:
+                if not future.done():
+                    future.set_result([by_url[url] for url in urls if url in by_url])
+    
+    async def _stop_bulk_worker(self):
+        """Cancel the bulk analysis worker and the requests still queued for it"""
+        worker, self._bulk_worker_task = self._bulk_worker_task, None
+        if worker is None:
+            return
+        
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+        while not self._pending_bulk.empty():
+            _, _, future = self._pending_bulk.get_nowait()
+            future.cancel()
+    
     async def _bulk_keyword_analysis_task(self, keywords: List[str]) -> Dict[str, Any]:
         """Task for bulk keyword analysis"""
         return await self._analyze_keywords_task(keywords)
@@ -300,43 +749,147 @@ class TaskScheduler:
         # Placeholder for report generation
         return {"report_type": report_type, "generated": True}
     
-    def _save_tasks(self):
-        """Save tasks to persistent storage"""
+    def _mark_dirty(self, task_id: str):
+        """Request that a task's state be written to persistent storage"""
+        with self._dirty_lock:
+            self._dirty_ids.add(task_id)
+        self._dirty.set()
+    
+    def _open_log(self):
+        """Open the task log for appending and start the thread that writes to it"""
+        self._log = open(self._log_file, 'a', encoding='utf-8')
+        self._persist_closing = threading.Event()
+        self._persist_thread = threading.Thread(
+            target=self._persist_loop, args=(self._persist_closing,), daemon=True
+        )
+        self._persist_thread.start()
+    
+    def _persist_loop(self, closing: threading.Event):
+        """Append dirty tasks to the log whenever they have been marked dirty, until closed"""
+        while not closing.is_set():
+            self._dirty.wait()
+            closing.wait(self.persist_delay)  # let a burst of changes accumulate
+            self._dirty.clear()
+            self._append_log()
+    
+    def _encode_task(self, task: Optional[ScheduledTask]) -> Optional[Dict[str, Any]]:
+        """Shallow field copy of a task; enums and other values are handled by the encoder"""
+        if task is None:
+            return None
+        return {f.name: getattr(task, f.name) for f in TASK_FIELDS}
+    
+    def _append_log(self):
+        """Append the current state of dirty tasks to the log, compacting when it grows long"""
         try:
-            with open(self.persist_file, 'wb') as f:
-                # Convert tasks to serializable format
-                serializable_tasks = {}
-                for task_id, task in self.tasks.items():
-                    task_dict = asdict(task)
-                    # Convert enums to strings
-                    task_dict['priority'] = task.priority.value
-                    task_dict['status'] = task.status.value
-                    serializable_tasks[task_id] = task_dict
-                
-                pickle.dump(serializable_tasks, f)
+            with self._dirty_lock:
+                dirty_ids, self._dirty_ids = self._dirty_ids, set()
+            if not dirty_ids:
+                return
+            with self._save_lock:
+                # One JSON line per task: [task_id, fields], or [task_id, null] once removed
+                records = [
+                    json.dumps([task_id, self._encode_task(self.tasks.get(task_id))],
+                               separators=(',', ':'), default=_encode_task_value)
+                    for task_id in dirty_ids
+                ]
+                self._log.write('\n'.join(records) + '\n')
+                self._log.flush()
+                self._log_records += len(records)
+                compact = self._log_records >= self.compact_every
+            if compact:
+                self._compact()
+        except Exception as e:
+            logger.error(f"Failed to append task log: {e}")
+    
+    def _compact(self) -> bool:
+        """Rewrite the snapshot from the in-memory tasks and truncate the log"""
+        with self._save_lock:
+            with self._dirty_lock:
+                self._dirty_ids.clear()
+            if not self._save_tasks():
+                return False
+            self._log.seek(0)
+            self._log.truncate()
+            self._log_records = 0
+            return True
+    
+    def _save_tasks(self) -> bool:
+        """Save a snapshot of all tasks to persistent storage"""
+        try:
+            serializable_tasks = {
+                task_id: self._encode_task(task) for task_id, task in list(self.tasks.items())
+            }
+            data = json.dumps(serializable_tasks, separators=(',', ':'), default=_encode_task_value)
+            
+            # Write to a temp file and swap it in so a crash never leaves a partial file
+            tmp_file = f"{self.persist_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_file, self.persist_file)
+            return True
         except Exception as e:
             logger.error(f"Failed to save tasks: {e}")
+            return False
     
     def _load_tasks(self):
-        """Load tasks from persistent storage"""
-        if not os.path.exists(self.persist_file):
-            return
-        
+        """Load tasks from the snapshot and replay the log on top of it"""
+        serializable_tasks = {}
+        # Tasks used to be pickled to tasks.pkl; import that file once if there's no snapshot yet
+        legacy_file = os.path.splitext(self.persist_file)[0] + '.pkl'
+        migrated = False
         try:
-            with open(self.persist_file, 'rb') as f:
-                serializable_tasks = pickle.load(f)
-                
-                for task_id, task_dict in serializable_tasks.items():
+            if os.path.exists(self.persist_file):
+                with open(self.persist_file, 'r', encoding='utf-8') as f:
+                    serializable_tasks = json.load(f)
+                if legacy_file != self.persist_file and os.path.exists(legacy_file):
+                    logger.warning(f"Ignoring old task file {legacy_file}; "
+                                   f"tasks are loaded from {self.persist_file}")
+            elif legacy_file != self.persist_file and os.path.exists(legacy_file):
+                with open(legacy_file, 'rb') as f:
+                    serializable_tasks = pickle.load(f)
+                migrated = True
+            
+            replayed = 0
+            with open(self._log_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        task_id, task_dict = json.loads(line)
+                    except ValueError:
+                        break  # torn final record from an interrupted write
+                    if task_dict is None:
+                        serializable_tasks.pop(task_id, None)
+                    else:
+                        serializable_tasks[task_id] = task_dict
+                    replayed += 1
+            
+            skipped = 0
+            for task_id, task_dict in serializable_tasks.items():
+                try:
                     # Convert strings back to enums
                     task_dict['priority'] = TaskPriority(task_dict['priority'])
                     task_dict['status'] = TaskStatus(task_dict['status'])
                     
                     task = ScheduledTask(**task_dict)
-                    self.tasks[task_id] = task
-                    
-                    # Reschedule if task is pending
                     if task.status == TaskStatus.PENDING:
-                        self._schedule_task(task)
+                        self._next_delay(task)  # fails on an unusable schedule
+                except (KeyError, TypeError, ValueError) as e:
+                    # One bad record must not cost the tasks stored after it
+                    logger.error(f"Skipping unreadable task {task_id}: {e}")
+                    skipped += 1
+                    continue
+                
+                self.tasks[task_id] = task
+                self._index_task(task)
+                
+                # Reschedule if task is pending
+                if task.status == TaskStatus.PENDING:
+                    self._schedule_task(task)
+            
+            if replayed or skipped or migrated:
+                saved = self._compact()
+                if migrated and saved:
+                    os.replace(legacy_file, f"{legacy_file}.migrated")
+                    logger.info(f"Migrated {len(self.tasks)} tasks from {legacy_file} to {self.persist_file}")
             
             logger.info(f"Loaded {len(self.tasks)} tasks from storage")
             
@@ -450,6 +1003,7 @@ class TaskManager:
     def shutdown(self):
         """Shutdown the task manager"""
         self.scheduler.stop_scheduler()
+        self.scheduler.close()
 
 # Example usage and testing
 def example_task_scheduling():
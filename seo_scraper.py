@@ -1,7 +1,10 @@
 """
 Main SEO Scraper - Orchestrates all scraping modules
 """
+import asyncio
+import functools
 import logging
+import threading
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 from urllib.parse import urlparse
@@ -20,6 +23,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@functools.lru_cache(maxsize=1024)
+def _extract_domain(url: str) -> str:
+    """Domain of a URL without the www. prefix"""
+    return urlparse(url).netloc.removeprefix('www.')
+
+async def _none() -> None:
+    """Placeholder for a skipped analysis stage"""
+    return None
+
 class SEOScraper:
     """Main SEO Scraper class that orchestrates all analysis modules"""
     
@@ -33,9 +45,33 @@ class SEOScraper:
         self.content_analyzer = ContentAnalyzer(self.db_manager)
         self.competitor_analyzer = CompetitorAnalyzer(self.db_manager, self.browser_manager)
         
+        # Content analyzers of the worker threads running the sync analysis stages
+        self._thread_analyzers = threading.local()
+        
         logger.info("SEO Scraper initialized successfully")
     
-    def analyze_comprehensive(self, url: str, primary_keyword: str = None) -> Dict[str, Any]:
+    def _thread_content_analyzer(self) -> ContentAnalyzer:
+        """Content analyzer owned by the calling thread
+        
+        Stages running concurrently in worker threads each get their own analyzer,
+        as a requests session isn't safe to share between threads. The database
+        manager opens a connection per operation, so all analyzers share it.
+        """
+        analyzer = getattr(self._thread_analyzers, 'content_analyzer', None)
+        if analyzer is None:
+            analyzer = ContentAnalyzer(self.db_manager)
+            self._thread_analyzers.content_analyzer = analyzer
+        return analyzer
+    
+    def _analyze_content(self, url: str, target_keywords: List[str] = None):
+        """Content analysis stage, run in a worker thread"""
+        return self._thread_content_analyzer().analyze_content_enhanced(url, target_keywords=target_keywords)
+    
+    def _audit_technical_seo(self, url: str):
+        """Technical SEO audit stage, run in a worker thread"""
+        return self._thread_content_analyzer().perform_technical_seo_audit(url)
+    
+    async def analyze_comprehensive(self, url: str, primary_keyword: str = None) -> Dict[str, Any]:
         """Perform comprehensive analysis of a website"""
         logger.info(f"Starting comprehensive analysis for {url}")
         
@@ -48,31 +84,31 @@ class SEOScraper:
                 'timestamp': datetime.now().isoformat()
             }
             
-            # Analyze content
-            if url:
-                result['content_analysis'] = self.content_analyzer.analyze_content_enhanced(url)
-            
-            # Perform technical SEO audit
-            if url:
-                result['technical_seo'] = self.content_analyzer.perform_technical_seo_audit(url)
+            # Content, technical audit and keyword research are independent
+            result['content_analysis'], result['technical_seo'], result['keyword_analysis'] = await asyncio.gather(
+                asyncio.to_thread(self._analyze_content, url) if url else _none(),
+                asyncio.to_thread(self._audit_technical_seo, url) if url else _none(),
+                self.keyword_scraper.scrape_google_keywords_enhanced(primary_keyword) if primary_keyword else _none()
+            )
             
-            # Analyze primary keyword if provided
-            if primary_keyword:
-                result['keyword_analysis'] = self.keyword_scraper.scrape_google_keywords_enhanced(primary_keyword)
-                if result['content_analysis']:
-                    # Re-analyze content with better keyword data
-                    target_keywords = [primary_keyword]
-                    if result['keyword_analysis']:
-                        target_keywords.extend(result['keyword_analysis'].related_keywords[:5])
-                    
-                    result['content_analysis'] = self.content_analyzer.analyze_content_enhanced(
-                        url, target_keywords=target_keywords
-                    )
+            # Re-analyze content with better keyword data while competitors are analyzed
+            target_keywords = None
+            if primary_keyword and result['content_analysis']:
+                target_keywords = [primary_keyword]
+                if result['keyword_analysis']:
+                    target_keywords.extend(result['keyword_analysis'].related_keywords[:5])
             
-            # Analyze competitors if we have basic results
+            domain = None
             if url and (result['content_analysis'] or result['technical_seo']):
-                domain = urlparse(url).netloc.replace('www.', '')
-                result['competitor_analysis'] = self.competitor_analyzer.analyze_competitors(domain)
+                domain = _extract_domain(url)
+            
+            # The competitor analyzer keeps no per-call state, so threads can share it
+            content_analysis, result['competitor_analysis'] = await asyncio.gather(
+                asyncio.to_thread(self._analyze_content, url, target_keywords) if target_keywords else _none(),
+                asyncio.to_thread(self.competitor_analyzer.analyze_competitors, domain) if domain else _none()
+            )
+            if content_analysis:
+                result['content_analysis'] = content_analysis
             
             logger.info("Completed comprehensive analysis")
             return result
@@ -81,24 +117,40 @@ class SEOScraper:
             logger.error(f"Error in comprehensive analysis: {e}")
             return None
     
-    def track_keyword_rankings(self, keywords: List[str]) -> bool:
-        """Track keyword rankings over time"""
+    async def track_keyword_rankings_async(self, keywords: List[str], concurrency: int = 5) -> bool:
+        """Track keyword rankings concurrently, at most `concurrency` searches at a time"""
         logger.info(f"Tracking rankings for {len(keywords)} keywords")
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def track(keyword: str):
+            async with semaphore:
+                return await self.keyword_scraper.scrape_google_keywords_enhanced(keyword)
+        
+        results = await asyncio.gather(*(track(keyword) for keyword in keywords), return_exceptions=True)
         
+        success = True
+        for keyword, result in zip(keywords, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Error tracking keyword ranking for '{keyword}': {result}")
+                success = False
+        return success
+    
+    def track_keyword_rankings(self, keywords: List[str]) -> bool:
+        """Track keyword rankings over time, from synchronous code"""
         try:
-            for keyword in keywords:
-                self.keyword_scraper.scrape_google_keywords_enhanced(keyword)
-            return True
-        except Exception as e:
-            logger.error(f"Error tracking keyword rankings: {e}")
-            return False
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.track_keyword_rankings_async(keywords))
+        # asyncio.run() can't nest, and blocking here would stall the caller's loop
+        raise RuntimeError("track_keyword_rankings() called from a running event loop; "
+                           "await track_keyword_rankings_async() instead")
     
     def cleanup_old_data(self, days_to_keep: int = 30):
         """Clean up old data from the database"""
         logger.info(f"Cleaning up data older than {days_to_keep} days")
         self.db_manager.cleanup_old_data(days_to_keep)
 
-def main():
+async def main():
     """Example usage of the SEO Scraper"""
     scraper = SEOScraper()
     
@@ -106,7 +158,7 @@ def main():
     url = "https://example.com"
     keyword = "example keyword"
     
-    results = scraper.analyze_comprehensive(url, keyword)
+    results = await scraper.analyze_comprehensive(url, keyword)
     
     if results:
         print(f"Analysis completed for {url}")
@@ -116,4 +168,4 @@ def main():
         print(f"Competitor analysis: {'✓' if results['competitor_analysis'] else '✗'}")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -3,8 +3,10 @@ Pytest configuration and shared fixtures
 """
 import pytest
 import os
-import tempfile
 import sqlite3
+import uuid
+import copy
+from types import SimpleNamespace
 from unittest.mock import Mock, patch
 import asyncio
 from datetime import datetime
@@ -15,22 +17,19 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from config import ScraperConfig
 from database import DatabaseManager
+from content_analyzer import ContentAnalyzer
 from models import KeywordData, ContentData, TechnicalSEOData
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def temp_db():
-    """Create a temporary database for testing"""
-    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as f:
-        db_path = f.name
+    """Create a private in-memory database for the test session"""
+    db_path = f"file:memdb_{uuid.uuid4().hex}?mode=memory&cache=shared"
     
+    # A shared in-memory database only lives while a connection to it is open
+    keeper = sqlite3.connect(db_path, uri=True)
     yield db_path
-    
-    # Cleanup
-    try:
-        os.unlink(db_path)
-    except OSError:
-        pass
+    keeper.close()
 
 
 @pytest.fixture
@@ -45,14 +44,122 @@ def test_config(temp_db):
     return config
 
 
-@pytest.fixture
-def db_manager(temp_db):
-    """Database manager with temporary database"""
+@pytest.fixture(scope="session")
+def _session_db_manager(temp_db):
+    """Database manager whose schema is created once per session"""
     return DatabaseManager(temp_db)
 
 
+@pytest.fixture(scope="session")
+def _pristine_db(_session_db_manager):
+    """Snapshot of the freshly built, empty schema and a connection to restore it through"""
+    target = sqlite3.connect(_session_db_manager.db_path, uri=True)
+    template = sqlite3.connect(":memory:")
+    target.backup(template)
+    yield template, target
+    template.close()
+    target.close()
+
+
+@pytest.fixture
+def db_manager(_session_db_manager, _pristine_db):
+    """Session database manager, reset to the empty schema after each test"""
+    yield _session_db_manager
+    
+    # DatabaseManager commits on every call, so undo the test's writes by copying
+    # the pristine pages back over the database
+    template, target = _pristine_db
+    template.backup(target)
+
+
+@pytest.fixture(scope="session")
+def _read_conn(temp_db):
+    """Long-lived connection for checking what the manager wrote"""
+    conn = sqlite3.connect(temp_db, uri=True)
+    # mode=ro can't be combined with mode=memory in the URI, so enforce it here
+    conn.execute("PRAGMA query_only = ON")
+    yield conn
+    conn.close()
+
+
 @pytest.fixture
-def sample_keyword_data():
+def db_cursor(_read_conn, db_manager):
+    """Cursor on the shared read connection, closed before the tables are emptied"""
+    cursor = _read_conn.cursor()
+    yield cursor
+    cursor.close()
+
+
+@pytest.fixture(scope="session")
+def _analyzer_template():
+    """ContentAnalyzer built once; its requests session is shared by the copies"""
+    return ContentAnalyzer(None)
+
+
+@pytest.fixture
+def analyzer(_analyzer_template, db_manager):
+    """Shallow copy of the template analyzer bound to the test's database"""
+    analyzer = copy.copy(_analyzer_template)
+    analyzer.db_manager = db_manager
+    return analyzer
+
+
+@pytest.fixture
+def stub_analyzer(analyzer, monkeypatch):
+    """Replace analyzer methods with plain functions returning fixed values"""
+    def _stub_analyzer(**returns):
+        for name, value in returns.items():
+            monkeypatch.setattr(analyzer, name, lambda *args, _value=value, **kwargs: _value)
+        return analyzer
+    return _stub_analyzer
+
+
+@pytest.fixture
+def serve_http(analyzer, monkeypatch):
+    """Answer the analyzer's HTTP GETs with a canned response or exception"""
+    def _serve_http(response=None, exc=None):
+        def get(url, **kwargs):
+            if exc is not None:
+                raise exc
+            return response
+        # Swap the session on this test's analyzer copy only; the template keeps the real one
+        monkeypatch.setattr(analyzer, 'session', SimpleNamespace(get=get))
+        return analyzer
+    return _serve_http
+
+
+@pytest.fixture(scope="session")
+def client():
+    """FastAPI test client shared by the API tests"""
+    from fastapi.testclient import TestClient
+    from api import app
+    
+    # Not entered as a context manager, so the startup handler doesn't build a real app
+    client = TestClient(app)
+    
+    # Warm the app once so the first real test doesn't pay for route setup
+    client.get("/")
+    return client
+
+
+@pytest.fixture(scope="module")
+def now_dt():
+    """Current time, read once per module so every test there agrees on "now"
+    
+    Cache freshness is checked against the real clock (and SQLite's 'now'),
+    so this can't be a fixed date.
+    """
+    return datetime.now()
+
+
+@pytest.fixture(scope="module")
+def now_iso(now_dt):
+    """ISO string of now_dt, as stored in the timestamp columns"""
+    return now_dt.isoformat()
+
+
+@pytest.fixture(scope="module")
+def sample_keyword_data(now_iso):
     """Sample keyword data for testing"""
     return KeywordData(
         keyword="test keyword",
@@ -63,12 +170,12 @@ def sample_keyword_data():
         people_also_ask=["Question 1?", "Question 2?"],
         featured_snippet="Sample snippet",
         local_pack=["Business 1", "Business 2"],
-        timestamp=datetime.now().isoformat()
+        timestamp=now_iso
     )
 
 
-@pytest.fixture
-def sample_content_data():
+@pytest.fixture(scope="module")
+def sample_content_data(now_iso):
     """Sample content data for testing"""
     return ContentData(
         title="Test Page Title",
@@ -86,12 +193,12 @@ def sample_content_data():
         schema_markup=["Article", "Organization"],
         page_speed_score=85.0,
         mobile_friendly=True,
-        timestamp=datetime.now().isoformat()
+        timestamp=now_iso
     )
 
 
-@pytest.fixture
-def sample_technical_seo_data():
+@pytest.fixture(scope="module")
+def sample_technical_seo_data(now_iso):
     """Sample technical SEO data for testing"""
     return TechnicalSEOData(
         url="https://example.com",
@@ -108,13 +215,30 @@ def sample_technical_seo_data():
         mobile_friendly=True,
         ssl_certificate=True,
         structured_data=["Article"],
-        timestamp=datetime.now().isoformat()
+        timestamp=now_iso
     )
 
 
-@pytest.fixture
-def mock_response():
-    """Mock HTTP response"""
+@pytest.fixture(scope="session")
+def response_ok():
+    """Bare 200 response for tests that only read the status"""
+    mock = Mock()
+    mock.status_code = 200
+    mock.text = "Success"
+    return mock
+
+
+@pytest.fixture(scope="session")
+def response_404():
+    """Bare 404 response for tests that only read the status"""
+    mock = Mock()
+    mock.status_code = 404
+    return mock
+
+
+@pytest.fixture(scope="module")
+def _mock_response_template():
+    """Mock HTTP response, built once per module"""
     mock = Mock()
     mock.status_code = 200
     mock.content = b"""
@@ -138,8 +262,15 @@ def mock_response():
 
 
 @pytest.fixture
-def mock_playwright_page():
-    """Mock Playwright page object"""
+def mock_response(_mock_response_template):
+    """Mock HTTP response, with the calls recorded during the test cleared afterwards"""
+    yield _mock_response_template
+    _mock_response_template.reset_mock()
+
+
+@pytest.fixture(scope="module")
+def _mock_playwright_page_template():
+    """Mock Playwright page object, built once per module"""
     page = Mock()
     
     # Mock locator methods
@@ -157,11 +288,24 @@ def mock_playwright_page():
 
 
 @pytest.fixture
-def event_loop():
-    """Create an instance of the default event loop for the test session."""
-    loop = asyncio.get_event_loop_policy().new_event_loop()
-    yield loop
-    loop.close()
+def mock_playwright_page(_mock_playwright_page_template):
+    """Mock Playwright page object, with the calls recorded during the test cleared afterwards"""
+    yield _mock_playwright_page_template
+    _mock_playwright_page_template.reset_mock()
+
+
+@pytest.fixture(scope="session")
+def event_loop_policy():
+    """Run async tests on uvloop when it is installed
+    
+    pytest-asyncio sets this policy for the async tests and restores the
+    previous one afterwards.
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.get_event_loop_policy()
+    return uvloop.EventLoopPolicy()
 
 
 class MockBrowser:
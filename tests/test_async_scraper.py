@@ -0,0 +1,61 @@
+"""
+Tests for async scraping utilities
+"""
+import pytest
+import asyncio
+
+from async_scraper import AsyncHTTPClient
+
+
+@pytest.fixture
+def http_client(monkeypatch):
+    """HTTP client whose get() answers from a table of canned outcomes per URL"""
+    http_client = AsyncHTTPClient(max_concurrent=2, rate_limit=0)
+    http_client.outcomes = {}
+    
+    async def get(url, **kwargs):
+        outcome = http_client.outcomes[url]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        if outcome == "hang":
+            await asyncio.Event().wait()
+        return outcome
+    
+    monkeypatch.setattr(http_client, "get", get)
+    return http_client
+
+
+class TestGetMany:
+    """Tests for concurrent fetching"""
+    
+    @pytest.mark.asyncio
+    async def test_results_in_input_order(self, http_client):
+        """Test that responses come back in the order the URLs were given"""
+        http_client.outcomes = {"https://a.com": "a", "https://b.com": "b", "https://c.com": "c"}
+        
+        assert await http_client.get_many(["https://c.com", "https://a.com", "https://b.com"]) == ["c", "a", "b"]
+    
+    @pytest.mark.asyncio
+    async def test_failed_and_cancelled_fetches_are_none(self, http_client):
+        """Test that errors and cancelled fetches become None instead of leaking into the results"""
+        http_client.outcomes = {
+            "https://ok.com": "ok",
+            "https://error.com": RuntimeError("connection reset"),
+            "https://cancelled.com": asyncio.CancelledError(),
+        }
+        
+        results = await http_client.get_many(["https://ok.com", "https://error.com", "https://cancelled.com"])
+        
+        assert results == ["ok", None, None]
+    
+    @pytest.mark.asyncio
+    async def test_cancelling_the_call_propagates(self, http_client):
+        """Test that cancelling get_many itself still raises CancelledError to its caller"""
+        http_client.outcomes = {"https://slow.com": "hang"}
+        
+        call = asyncio.ensure_future(http_client.get_many(["https://slow.com"]))
+        await asyncio.sleep(0.01)
+        call.cancel()
+        
+        with pytest.raises(asyncio.CancelledError):
+            await call
@@ -2,13 +2,143 @@
 Tests for content analyzer module
 """
 import pytest
-from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime
+from bs4 import BeautifulSoup
 
 from content_analyzer import ContentAnalyzer
 from models import ContentData, TechnicalSEOData
 
 
+LINKS_HTML = '''
+<html>
+    <body>
+        <a href="https://example.com/page1">Internal Link</a>
+        <a href="https://external.com">External Link</a>
+        <a href="/relative">Relative Link</a>
+    </body>
+</html>
+'''
+
+IMAGES_HTML = '''
+<html>
+    <body>
+        <img src="image1.jpg" alt="Image 1" title="Title 1">
+        <img src="image2.jpg" alt="Image 2">
+        <img src="image3.jpg">
+    </body>
+</html>
+'''
+
+IMAGES_ALT_HTML = '''
+<html>
+    <body>
+        <img src="image1.jpg" alt="Image 1">
+        <img src="image2.jpg">
+        <img src="image3.jpg" alt="">
+    </body>
+</html>
+'''
+
+SCHEMA_HTML = '''
+<html>
+    <head>
+        <script type="application/ld+json">
+        {
+            "@context": "https://schema.org",
+            "@type": "Article",
+            "headline": "Test Article"
+        }
+        </script>
+        <script type="application/ld+json">
+        {
+            "@context": "https://schema.org",
+            "@type": "Organization",
+            "name": "Test Org"
+        }
+        </script>
+    </head>
+</html>
+'''
+
+SCHEMA_INVALID_HTML = '''
+<html>
+    <head>
+        <script type="application/ld+json">
+        { invalid json }
+        </script>
+    </head>
+</html>
+'''
+
+VIEWPORT_HTML = '''
+<html>
+    <head>
+        <meta name="viewport" content="width=device-width, initial-scale=1">
+    </head>
+</html>
+'''
+
+CLEAN_TEXT_HTML = '''
+<html>
+    <head>
+        <script>console.log("script");</script>
+        <style>.test { color: red; }</style>
+    </head>
+    <body>
+        <h1>Main Heading</h1>
+        <p>This is a paragraph with some text.</p>
+        <div>Another div with content.</div>
+    </body>
+</html>
+'''
+
+
+# Parsed once per module; the extractors under test only read the tree
+@pytest.fixture(scope="module")
+def soup_with_title():
+    return BeautifulSoup("<html><head><title>Test Page Title</title></head></html>", 'lxml')
+
+
+@pytest.fixture(scope="module")
+def soup_no_title():
+    return BeautifulSoup("<html><head></head></html>", 'lxml')
+
+
+@pytest.fixture(scope="module")
+def soup_meta():
+    return BeautifulSoup('<html><head><meta name="description" content="Test description"></head></html>', 'lxml')
+
+
+@pytest.fixture(scope="module")
+def soup_links():
+    return BeautifulSoup(LINKS_HTML, 'lxml')
+
+
+@pytest.fixture(scope="module")
+def soup_images():
+    return BeautifulSoup(IMAGES_HTML, 'lxml')
+
+
+@pytest.fixture(scope="module")
+def soup_images_alt():
+    return BeautifulSoup(IMAGES_ALT_HTML, 'lxml')
+
+
+@pytest.fixture(scope="module")
+def soup_schema():
+    return BeautifulSoup(SCHEMA_HTML, 'lxml')
+
+
+@pytest.fixture(scope="module")
+def soup_schema_invalid():
+    return BeautifulSoup(SCHEMA_INVALID_HTML, 'lxml')
+
+
+@pytest.fixture(scope="module")
+def soup_viewport():
+    return BeautifulSoup(VIEWPORT_HTML, 'lxml')
+
+
 class TestContentAnalyzer:
     """Tests for ContentAnalyzer class"""
     
@@ -18,203 +148,119 @@ class TestContentAnalyzer:
         assert analyzer.db_manager == db_manager
         assert analyzer.session is not None
     
-    @patch('content_analyzer.ContentAnalyzer._extract_clean_text')
-    @patch('content_analyzer.ContentAnalyzer._extract_title')
-    @patch('content_analyzer.ContentAnalyzer._extract_meta_description')
-    @patch('requests.Session.get')
-    def test_analyze_content_enhanced_success(self, mock_get, mock_meta, mock_title, mock_text, db_manager, mock_response):
+    def test_analyze_content_enhanced_success(self, serve_http, stub_analyzer, mock_response):
         """Test successful content analysis"""
-        # Setup mocks
-        mock_get.return_value = mock_response
-        mock_title.return_value = "Test Page Title"
-        mock_meta.return_value = "Test meta description"
-        mock_text.return_value = "This is test content for analysis"
-        
-        analyzer = ContentAnalyzer(db_manager)
+        serve_http(mock_response)
+        analyzer = stub_analyzer(
+            _extract_title="Test Page Title",
+            _extract_meta_description="Test meta description",
+            _extract_clean_text="This is test content for analysis",
+            _extract_links=(["https://example.com/page1"], ["https://external.com"]),
+            _extract_images=[{"src": "image.jpg", "alt": "Test image"}],
+            _extract_schema_markup=["Article"],
+            _calculate_keyword_density={"test": 2.5},
+            _calculate_reading_score=75.0,
+        )
+        
+        result = analyzer.analyze_content_enhanced("https://example.com", ["test"])
         
-        # Mock other methods
-        with patch.object(analyzer, '_extract_links') as mock_links, \
-             patch.object(analyzer, '_extract_images') as mock_images, \
-             patch.object(analyzer, '_extract_schema_markup') as mock_schema, \
-             patch.object(analyzer, '_calculate_keyword_density') as mock_density, \
-             patch.object(analyzer, '_calculate_reading_score') as mock_reading:
-            
-            mock_links.return_value = (["https://example.com/page1"], ["https://external.com"])
-            mock_images.return_value = [{"src": "image.jpg", "alt": "Test image"}]
-            mock_schema.return_value = ["Article"]
-            mock_density.return_value = {"test": 2.5}
-            mock_reading.return_value = 75.0
-            
-            result = analyzer.analyze_content_enhanced("https://example.com", ["test"])
-            
-            assert result is not None
-            assert result.title == "Test Page Title"
-            assert result.url == "https://example.com"
-            assert result.meta_description == "Test meta description"
-            assert result.word_count > 0
-            assert result.keyword_density == {"test": 2.5}
-            assert result.reading_score == 75.0
+        assert result is not None
+        assert result.title == "Test Page Title"
+        assert result.url == "https://example.com"
+        assert result.meta_description == "Test meta description"
+        assert result.word_count > 0
+        assert result.keyword_density == {"test": 2.5}
+        assert result.reading_score == 75.0
     
-    @patch('requests.Session.get')
-    def test_analyze_content_enhanced_http_error(self, mock_get, db_manager):
+    def test_analyze_content_enhanced_http_error(self, serve_http, response_404):
         """Test content analysis with HTTP error"""
-        mock_response = Mock()
-        mock_response.status_code = 404
-        mock_get.return_value = mock_response
+        analyzer = serve_http(response_404)
         
-        analyzer = ContentAnalyzer(db_manager)
         result = analyzer.analyze_content_enhanced("https://example.com/notfound")
         
         assert result is None
     
-    @patch('requests.Session.get')
-    def test_analyze_content_enhanced_exception(self, mock_get, db_manager):
+    def test_analyze_content_enhanced_exception(self, serve_http):
         """Test content analysis with exception"""
-        mock_get.side_effect = Exception("Network error")
+        analyzer = serve_http(exc=Exception("Network error"))
         
-        analyzer = ContentAnalyzer(db_manager)
         result = analyzer.analyze_content_enhanced("https://example.com")
         
         assert result is None
     
-    def test_analyze_content_enhanced_cached_data(self, db_manager, sample_content_data):
+    def test_analyze_content_enhanced_cached_data(self, analyzer, db_manager, sample_content_data):
         """Test content analysis with cached data"""
         # Save data to cache
         db_manager.save_content_data(sample_content_data)
         
-        analyzer = ContentAnalyzer(db_manager)
         result = analyzer.analyze_content_enhanced(sample_content_data.url)
         
         assert result is not None
         assert result.title == sample_content_data.title
         assert result.url == sample_content_data.url
     
-    @patch('content_analyzer.ContentAnalyzer._extract_title')
-    @patch('content_analyzer.ContentAnalyzer._extract_meta_description')
-    @patch('requests.Session.get')
-    def test_perform_technical_seo_audit_success(self, mock_get, mock_meta, mock_title, db_manager, mock_response):
+    def test_perform_technical_seo_audit_success(self, serve_http, stub_analyzer, mock_response):
         """Test successful technical SEO audit"""
-        # Setup mocks
-        mock_get.return_value = mock_response
-        mock_title.return_value = "Test Page"
-        mock_meta.return_value = "Test description"
+        serve_http(mock_response)
+        analyzer = stub_analyzer(
+            _extract_title="Test Page",
+            _extract_meta_description="Test description",
+            _extract_canonical_url="https://example.com",
+            _extract_robots_meta="index,follow",
+            _count_links=(5, 2),
+            _count_images_without_alt=1,
+            _extract_structured_data_types=["Article"],
+        )
+        
+        result = analyzer.perform_technical_seo_audit("https://example.com")
         
-        analyzer = ContentAnalyzer(db_manager)
-        
-        # Mock other methods
-        with patch.object(analyzer, '_extract_canonical_url') as mock_canonical, \
-             patch.object(analyzer, '_extract_robots_meta') as mock_robots, \
-             patch.object(analyzer, '_count_links') as mock_links, \
-             patch.object(analyzer, '_count_images_without_alt') as mock_images, \
-             patch.object(analyzer, '_extract_structured_data_types') as mock_schema:
-            
-            mock_canonical.return_value = "https://example.com"
-            mock_robots.return_value = "index,follow"
-            mock_links.return_value = (5, 2)
-            mock_images.return_value = 1
-            mock_schema.return_value = ["Article"]
-            
-            result = analyzer.perform_technical_seo_audit("https://example.com")
-            
-            assert result is not None
-            assert result.url == "https://example.com"
-            assert result.page_title == "Test Page"
-            assert result.meta_description == "Test description"
-            assert result.canonical_url == "https://example.com"
-            assert result.robots_meta == "index,follow"
-            assert result.internal_links_count == 5
-            assert result.external_links_count == 2
-            assert result.images_without_alt == 1
-            assert result.ssl_certificate is True  # HTTPS URL
+        assert result is not None
+        assert result.url == "https://example.com"
+        assert result.page_title == "Test Page"
+        assert result.meta_description == "Test description"
+        assert result.canonical_url == "https://example.com"
+        assert result.robots_meta == "index,follow"
+        assert result.internal_links_count == 5
+        assert result.external_links_count == 2
+        assert result.images_without_alt == 1
+        assert result.ssl_certificate is True  # HTTPS URL
     
-    def test_extract_title_valid(self, db_manager):
+    def test_extract_title_valid(self, analyzer, soup_with_title):
         """Test title extraction from valid HTML"""
-        from bs4 import BeautifulSoup
-        
-        html = "<html><head><title>Test Page Title</title></head></html>"
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        analyzer = ContentAnalyzer(db_manager)
-        result = analyzer._extract_title(soup)
+        result = analyzer._extract_title(soup_with_title)
         
         assert result == "Test Page Title"
     
-    def test_extract_title_missing(self, db_manager):
+    def test_extract_title_missing(self, analyzer, soup_no_title):
         """Test title extraction from HTML without title"""
-        from bs4 import BeautifulSoup
-        
-        html = "<html><head></head></html>"
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        analyzer = ContentAnalyzer(db_manager)
-        result = analyzer._extract_title(soup)
+        result = analyzer._extract_title(soup_no_title)
         
         assert result == "No Title"
     
-    def test_extract_meta_description_valid(self, db_manager):
+    def test_extract_meta_description_valid(self, analyzer, soup_meta):
         """Test meta description extraction from valid HTML"""
-        from bs4 import BeautifulSoup
-        
-        html = '<html><head><meta name="description" content="Test description"></head></html>'
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        analyzer = ContentAnalyzer(db_manager)
-        result = analyzer._extract_meta_description(soup)
+        result = analyzer._extract_meta_description(soup_meta)
         
         assert result == "Test description"
     
-    def test_extract_meta_description_missing(self, db_manager):
+    def test_extract_meta_description_missing(self, analyzer, soup_no_title):
         """Test meta description extraction from HTML without meta description"""
-        from bs4 import BeautifulSoup
-        
-        html = "<html><head></head></html>"
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        analyzer = ContentAnalyzer(db_manager)
-        result = analyzer._extract_meta_description(soup)
+        result = analyzer._extract_meta_description(soup_no_title)
         
         assert result == "No Meta Description"
     
-    def test_extract_links_valid(self, db_manager):
+    def test_extract_links_valid(self, analyzer, soup_links):
         """Test link extraction from valid HTML"""
-        from bs4 import BeautifulSoup
-        
-        html = '''
-        <html>
-            <body>
-                <a href="https://example.com/page1">Internal Link</a>
-                <a href="https://external.com">External Link</a>
-                <a href="/relative">Relative Link</a>
-            </body>
-        </html>
-        '''
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        analyzer = ContentAnalyzer(db_manager)
-        internal, external = analyzer._extract_links(soup, "https://example.com")
+        internal, external = analyzer._extract_links(soup_links, "https://example.com")
         
         assert len(internal) == 2  # Internal link and relative link
         assert len(external) == 1
         assert "https://example.com/page1" in internal
         assert "https://external.com" in external
     
-    def test_extract_images_valid(self, db_manager):
+    def test_extract_images_valid(self, analyzer, soup_images):
         """Test image extraction from valid HTML"""
-        from bs4 import BeautifulSoup
-        
-        html = '''
-        <html>
-            <body>
-                <img src="image1.jpg" alt="Image 1" title="Title 1">
-                <img src="image2.jpg" alt="Image 2">
-                <img src="image3.jpg">
-            </body>
-        </html>
-        '''
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        analyzer = ContentAnalyzer(db_manager)
-        images = analyzer._extract_images(soup)
+        images = analyzer._extract_images(soup_images)
         
         assert len(images) == 3
         assert images[0]["src"] == "image1.jpg"
@@ -222,83 +268,28 @@ class TestContentAnalyzer:
         assert images[0]["title"] == "Title 1"
         assert images[2]["alt"] == ""  # Missing alt
     
-    def test_count_images_without_alt(self, db_manager):
+    def test_count_images_without_alt(self, analyzer, soup_images_alt):
         """Test counting images without alt text"""
-        from bs4 import BeautifulSoup
-        
-        html = '''
-        <html>
-            <body>
-                <img src="image1.jpg" alt="Image 1">
-                <img src="image2.jpg">
-                <img src="image3.jpg" alt="">
-            </body>
-        </html>
-        '''
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        analyzer = ContentAnalyzer(db_manager)
-        count = analyzer._count_images_without_alt(soup)
+        count = analyzer._count_images_without_alt(soup_images_alt)
         
         assert count == 2  # One without alt, one with empty alt
     
-    def test_extract_schema_markup_valid(self, db_manager):
+    def test_extract_schema_markup_valid(self, analyzer, soup_schema):
         """Test schema markup extraction from valid HTML"""
-        from bs4 import BeautifulSoup
-        
-        html = '''
-        <html>
-            <head>
-                <script type="application/ld+json">
-                {
-                    "@context": "https://schema.org",
-                    "@type": "Article",
-                    "headline": "Test Article"
-                }
-                </script>
-                <script type="application/ld+json">
-                {
-                    "@context": "https://schema.org",
-                    "@type": "Organization",
-                    "name": "Test Org"
-                }
-                </script>
-            </head>
-        </html>
-        '''
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        analyzer = ContentAnalyzer(db_manager)
-        schema_types = analyzer._extract_schema_markup(soup)
+        schema_types = analyzer._extract_schema_markup(soup_schema)
         
         assert len(schema_types) == 2
         assert "Article" in schema_types
         assert "Organization" in schema_types
     
-    def test_extract_schema_markup_invalid_json(self, db_manager):
+    def test_extract_schema_markup_invalid_json(self, analyzer, soup_schema_invalid):
         """Test schema markup extraction with invalid JSON"""
-        from bs4 import BeautifulSoup
-        
-        html = '''
-        <html>
-            <head>
-                <script type="application/ld+json">
-                { invalid json }
-                </script>
-            </head>
-        </html>
-        '''
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        analyzer = ContentAnalyzer(db_manager)
-        schema_types = analyzer._extract_schema_markup(soup)
+        schema_types = analyzer._extract_schema_markup(soup_schema_invalid)
         
         assert len(schema_types) == 0
     
-    def test_calculate_keyword_density_valid(self, db_manager):
+    def test_calculate_keyword_density_valid(self, analyzer):
         """Test keyword density calculation"""
-        analyzer = ContentAnalyzer(db_manager)
-        
         text = "This is a test text with test words and more test content"
         keywords = ["test", "content", "missing"]
         
@@ -308,78 +299,42 @@ class TestContentAnalyzer:
         assert density["content"] > 0
         assert density["missing"] == 0
     
-    def test_calculate_keyword_density_empty(self, db_manager):
+    @pytest.mark.parametrize("text,keywords", [
+        ("", ["test"]),  # Empty text
+        ("test text", []),  # Empty keywords
+    ])
+    def test_calculate_keyword_density_empty(self, analyzer, text, keywords):
         """Test keyword density calculation with empty inputs"""
-        analyzer = ContentAnalyzer(db_manager)
-        
-        # Empty text
-        density = analyzer._calculate_keyword_density("", ["test"])
-        assert density == {}
-        
-        # Empty keywords
-        density = analyzer._calculate_keyword_density("test text", [])
+        density = analyzer._calculate_keyword_density(text, keywords)
         assert density == {}
     
-    def test_check_mobile_friendly_valid(self, db_manager):
+    def test_check_mobile_friendly_valid(self, analyzer, soup_viewport):
         """Test mobile-friendly check with viewport meta tag"""
-        from bs4 import BeautifulSoup
-        
-        html = '''
-        <html>
-            <head>
-                <meta name="viewport" content="width=device-width, initial-scale=1">
-            </head>
-        </html>
-        '''
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        analyzer = ContentAnalyzer(db_manager)
-        is_mobile_friendly = analyzer._check_mobile_friendly(soup)
+        is_mobile_friendly = analyzer._check_mobile_friendly(soup_viewport)
         
         assert is_mobile_friendly is True
     
-    def test_check_mobile_friendly_invalid(self, db_manager):
+    def test_check_mobile_friendly_invalid(self, analyzer, soup_no_title):
         """Test mobile-friendly check without viewport meta tag"""
-        from bs4 import BeautifulSoup
-        
-        html = "<html><head></head></html>"
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        analyzer = ContentAnalyzer(db_manager)
-        is_mobile_friendly = analyzer._check_mobile_friendly(soup)
+        is_mobile_friendly = analyzer._check_mobile_friendly(soup_no_title)
         
         assert is_mobile_friendly is False
     
-    def test_calculate_page_speed_score(self, db_manager):
+    @pytest.mark.parametrize("load_time,expected", [
+        (0.5, 100.0),
+        (2.0, 80.0),
+        (4.0, 60.0),
+        (6.0, 40.0),
+    ])
+    def test_calculate_page_speed_score(self, analyzer, load_time, expected):
         """Test page speed score calculation"""
-        analyzer = ContentAnalyzer(db_manager)
-        
-        # Test different load times
-        assert analyzer._calculate_page_speed_score(0.5) == 100.0
-        assert analyzer._calculate_page_speed_score(2.0) == 80.0
-        assert analyzer._calculate_page_speed_score(4.0) == 60.0
-        assert analyzer._calculate_page_speed_score(6.0) == 40.0
+        assert analyzer._calculate_page_speed_score(load_time) == expected
     
-    def test_extract_clean_text_valid(self, db_manager):
+    def test_extract_clean_text_valid(self, analyzer):
         """Test clean text extraction"""
-        from bs4 import BeautifulSoup
+        # Parsed per test: _extract_clean_text decomposes script/style tags
+        soup = BeautifulSoup(CLEAN_TEXT_HTML, 'lxml')
         
-        html = '''
-        <html>
-            <head>
-                <script>console.log("script");</script>
-                <style>.test { color: red; }</style>
-            </head>
-            <body>
-                <h1>Main Heading</h1>
-                <p>This is a paragraph with some text.</p>
-                <div>Another div with content.</div>
-            </body>
-        </html>
-        '''
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        analyzer = ContentAnalyzer(db_manager)
         clean_text = analyzer._extract_clean_text(soup)
         
         assert "Main Heading" in clean_text
@@ -2,8 +2,10 @@
 Tests for database operations
 """
 import pytest
-from datetime import datetime, timedelta
+from datetime import timedelta
 import json
+import sqlite3
+from dataclasses import replace
 
 from database import DatabaseManager
 from models import KeywordData, ContentData, TechnicalSEOData, SERPData
@@ -48,17 +50,17 @@ class TestDatabaseManager:
         assert retrieved_data.related_keywords == sample_keyword_data.related_keywords
         assert retrieved_data.people_also_ask == sample_keyword_data.people_also_ask
     
-    def test_keyword_data_expiration(self, db_manager, sample_keyword_data):
+    def test_keyword_data_expiration(self, db_manager, sample_keyword_data, now_dt):
         """Test keyword data expiration"""
         # Modify timestamp to be older than max_age
-        old_timestamp = (datetime.now() - timedelta(days=10)).isoformat()
-        sample_keyword_data.timestamp = old_timestamp
+        old_timestamp = (now_dt - timedelta(days=10)).isoformat()
+        old_keyword_data = replace(sample_keyword_data, timestamp=old_timestamp)
         
-        db_manager.save_keyword_data(sample_keyword_data)
+        db_manager.save_keyword_data(old_keyword_data)
         
         # Should return None for expired data
         retrieved_data = db_manager.get_cached_keyword_data(
-            sample_keyword_data.keyword, max_age_days=7
+            old_keyword_data.keyword, max_age_days=7
         )
         
         assert retrieved_data is None
@@ -79,43 +81,37 @@ class TestDatabaseManager:
         assert retrieved_data.keyword_density == sample_content_data.keyword_density
         assert retrieved_data.mobile_friendly == sample_content_data.mobile_friendly
     
-    def test_content_data_expiration(self, db_manager, sample_content_data):
+    def test_content_data_expiration(self, db_manager, sample_content_data, now_dt):
         """Test content data expiration"""
         # Modify timestamp to be older than max_age
-        old_timestamp = (datetime.now() - timedelta(days=2)).isoformat()
-        sample_content_data.timestamp = old_timestamp
+        old_timestamp = (now_dt - timedelta(days=2)).isoformat()
+        old_content_data = replace(sample_content_data, timestamp=old_timestamp)
         
-        db_manager.save_content_data(sample_content_data)
+        db_manager.save_content_data(old_content_data)
         
         # Should return None for expired data
         retrieved_data = db_manager.get_cached_content_data(
-            sample_content_data.url, max_age_days=1
+            old_content_data.url, max_age_days=1
         )
         
         assert retrieved_data is None
     
-    def test_save_technical_seo_data(self, db_manager, sample_technical_seo_data):
+    def test_save_technical_seo_data(self, db_manager, db_cursor, sample_technical_seo_data):
         """Test saving technical SEO data"""
         # Save technical SEO data
         db_manager.save_technical_seo_data(sample_technical_seo_data)
         
         # Verify data was saved by checking database directly
-        import sqlite3
-        conn = sqlite3.connect(db_manager.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM technical_seo WHERE url = ?", (sample_technical_seo_data.url,))
-        row = cursor.fetchone()
+        db_cursor.execute("SELECT * FROM technical_seo WHERE url = ?", (sample_technical_seo_data.url,))
+        row = db_cursor.fetchone()
         
         assert row is not None
         assert row[1] == sample_technical_seo_data.url
         assert row[2] == sample_technical_seo_data.page_title
         assert row[7] == sample_technical_seo_data.h1_count
         assert row[8] == sample_technical_seo_data.h2_count
-        
-        conn.close()
     
-    def test_save_serp_data(self, db_manager):
+    def test_save_serp_data(self, db_manager, db_cursor, now_iso):
         """Test saving SERP tracking data"""
         serp_data = SERPData(
             keyword="test keyword",
@@ -123,132 +119,110 @@ class TestDatabaseManager:
             position=1,
             title="Test Result",
             description="Test description",
-            timestamp=datetime.now().isoformat()
+            timestamp=now_iso
         )
         
         db_manager.save_serp_data(serp_data)
         
         # Verify data was saved
-        import sqlite3
-        conn = sqlite3.connect(db_manager.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM serp_tracking WHERE keyword = ?", (serp_data.keyword,))
-        row = cursor.fetchone()
+        db_cursor.execute("SELECT * FROM serp_tracking WHERE keyword = ?", (serp_data.keyword,))
+        row = db_cursor.fetchone()
         
         assert row is not None
         assert row[1] == serp_data.keyword
         assert row[2] == serp_data.url
         assert row[3] == serp_data.position
-        
-        conn.close()
     
-    def test_get_recent_serp_data(self, db_manager):
+    def test_get_recent_serp_data(self, db_manager, now_iso):
         """Test retrieving recent SERP data"""
         keyword = "test keyword"
         
-        # Save some SERP data
-        serp_data1 = SERPData(
-            keyword=keyword,
-            url="https://example1.com",
-            position=1,
-            title="Result 1",
-            description="Description 1",
-            timestamp=datetime.now().isoformat()
-        )
-        
-        serp_data2 = SERPData(
-            keyword=keyword,
-            url="https://example2.com",
-            position=2,
-            title="Result 2",
-            description="Description 2",
-            timestamp=datetime.now().isoformat()
-        )
-        
-        db_manager.save_serp_data(serp_data1)
-        db_manager.save_serp_data(serp_data2)
+        # Save some SERP data, out of position order
+        db_manager.save_serp_data_many([
+            SERPData(
+                keyword=keyword,
+                url=f"https://example{i}.com",
+                position=i,
+                title=f"Result {i}",
+                description=f"Description {i}",
+                timestamp=now_iso
+            ) for i in (2, 1)
+        ])
         
         # Retrieve recent data
         recent_data = db_manager.get_recent_serp_data(keyword, max_age_hours=1)
         
-        assert len(recent_data) == 2
-        assert recent_data[0].position == 1  # Should be ordered by position
-        assert recent_data[1].position == 2
+        # Should be ordered by position
+        assert [(r.position, r.url) for r in recent_data] == [
+            (1, "https://example1.com"),
+            (2, "https://example2.com")
+        ]
     
-    def test_cleanup_old_data(self, db_manager, sample_keyword_data, sample_content_data):
+    def test_cleanup_old_data(self, db_manager, db_cursor, sample_keyword_data, sample_content_data, now_dt):
         """Test cleanup of old data"""
-        # Save some data
-        db_manager.save_keyword_data(sample_keyword_data)
-        db_manager.save_content_data(sample_content_data)
-        
         # Create old data by modifying timestamps
-        old_timestamp = (datetime.now() - timedelta(days=40)).isoformat()
-        
-        import sqlite3
-        conn = sqlite3.connect(db_manager.db_path)
-        cursor = conn.cursor()
-        
-        # Insert old data
-        cursor.execute("""
-            INSERT INTO keywords (keyword, search_volume, competition, difficulty_score, 
-                                related_keywords, people_also_ask, featured_snippet, 
-                                local_pack, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            "old_keyword", "1000", "Low", 20, "[]", "[]", "", "[]", old_timestamp
-        ))
-        
-        cursor.execute("""
-            INSERT INTO content (url, title, meta_description, h1_tags, h2_tags, h3_tags,
-                               word_count, keyword_density, reading_score, internal_links,
-                               external_links, images, schema_markup, page_speed_score,
-                               mobile_friendly, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            "https://old-example.com", "Old Page", "Old description", "[]", "[]", "[]",
-            100, "{}", 50.0, "[]", "[]", "[]", "[]", 70.0, True, old_timestamp
-        ))
-        
-        conn.commit()
-        conn.close()
+        old_timestamp = (now_dt - timedelta(days=40)).isoformat()
+        
+        # Seed recent and old rows in a single transaction
+        with db_manager.transaction() as conn:
+            db_manager.save_keyword_data(sample_keyword_data)
+            db_manager.save_content_data(sample_content_data)
+            
+            conn.executemany("""
+                INSERT INTO keywords (keyword, search_volume, competition, difficulty_score, 
+                                    related_keywords, people_also_ask, featured_snippet, 
+                                    local_pack, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (keyword, "1000", "Low", 20, "[]", "[]", "", "[]", old_timestamp)
+                for keyword in ("old_keyword", "older_keyword")
+            ])
+            
+            conn.executemany("""
+                INSERT INTO content (url, title, meta_description, h1_tags, h2_tags, h3_tags,
+                                   word_count, keyword_density, reading_score, internal_links,
+                                   external_links, images, schema_markup, page_speed_score,
+                                   mobile_friendly, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (url, "Old Page", "Old description", "[]", "[]", "[]",
+                 100, "{}", 50.0, "[]", "[]", "[]", "[]", 70.0, True, old_timestamp)
+                for url in ("https://old-example.com", "https://older-example.com")
+            ])
+        
+        count_query = "SELECT (SELECT COUNT(*) FROM keywords), (SELECT COUNT(*) FROM content)"
         
         # Verify data exists before cleanup
-        conn = sqlite3.connect(db_manager.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM keywords")
-        keywords_count_before = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM content")
-        content_count_before = cursor.fetchone()[0]
-        conn.close()
+        keywords_count_before, content_count_before = db_cursor.execute(count_query).fetchone()
         
-        assert keywords_count_before == 2
-        assert content_count_before == 2
+        assert keywords_count_before == 3
+        assert content_count_before == 3
         
         # Cleanup old data (keep 30 days)
         db_manager.cleanup_old_data(days_to_keep=30)
         
         # Verify old data was removed
-        conn = sqlite3.connect(db_manager.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM keywords")
-        keywords_count_after = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM content")
-        content_count_after = cursor.fetchone()[0]
-        conn.close()
+        keywords_count_after, content_count_after = db_cursor.execute(count_query).fetchone()
         
         assert keywords_count_after == 1  # Only recent data should remain
         assert content_count_after == 1
+        
+        # The cleanup delete should use the timestamp index rather than a full scan
+        plan = db_cursor.execute(
+            "EXPLAIN QUERY PLAN DELETE FROM keywords WHERE timestamp < ?", (old_timestamp,)
+        ).fetchall()
+        assert any("USING INDEX idx_keywords_ts" in str(row) for row in plan)
     
-    def test_duplicate_keyword_handling(self, db_manager, sample_keyword_data):
+    def test_duplicate_keyword_handling(self, db_manager, db_cursor, sample_keyword_data):
         """Test handling of duplicate keyword entries"""
         # Save the same keyword data twice
         db_manager.save_keyword_data(sample_keyword_data)
         
         # Modify some data and save again
-        sample_keyword_data.search_volume = "10,000-100,000"
-        sample_keyword_data.difficulty_score = 80
-        db_manager.save_keyword_data(sample_keyword_data)
+        updated_keyword_data = replace(
+            sample_keyword_data, search_volume="10,000-100,000", difficulty_score=80
+        )
+        db_manager.save_keyword_data(updated_keyword_data)
         
         # Should only have one entry (updated)
         retrieved_data = db_manager.get_cached_keyword_data(sample_keyword_data.keyword)
@@ -258,16 +232,23 @@ class TestDatabaseManager:
         assert retrieved_data.difficulty_score == 80
         
         # Verify only one entry exists in database
-        import sqlite3
-        conn = sqlite3.connect(db_manager.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM keywords WHERE keyword = ?", (sample_keyword_data.keyword,))
-        count = cursor.fetchone()[0]
-        conn.close()
+        db_cursor.execute("SELECT COUNT(*) FROM keywords WHERE keyword = ?", (sample_keyword_data.keyword,))
+        count = db_cursor.fetchone()[0]
         
         assert count == 1
     
-    def test_json_serialization_deserialization(self, db_manager):
+    def test_transaction_rolls_back_on_error(self, db_manager, sample_keyword_data, sample_content_data):
+        """Test that a failed transaction discards all of its writes"""
+        with pytest.raises(RuntimeError):
+            with db_manager.transaction():
+                db_manager.save_keyword_data(sample_keyword_data)
+                db_manager.save_content_data(sample_content_data)
+                raise RuntimeError("abort")
+        
+        assert db_manager.get_cached_keyword_data(sample_keyword_data.keyword) is None
+        assert db_manager.get_cached_content_data(sample_content_data.url) is None
+    
+    def test_json_serialization_deserialization(self, db_manager, db_cursor, now_iso):
         """Test JSON serialization/deserialization of complex data"""
         keyword_data = KeywordData(
             keyword="test",
@@ -278,7 +259,7 @@ class TestDatabaseManager:
             people_also_ask=["Question 1?", "Question 2?"],
             featured_snippet="Test snippet",
             local_pack=["Business A", "Business B"],
-            timestamp=datetime.now().isoformat()
+            timestamp=now_iso
         )
         
         db_manager.save_keyword_data(keyword_data)
@@ -287,19 +268,16 @@ class TestDatabaseManager:
         assert retrieved_data.related_keywords == ["keyword1", "keyword2", "keyword3"]
         assert retrieved_data.people_also_ask == ["Question 1?", "Question 2?"]
         assert retrieved_data.local_pack == ["Business A", "Business B"]
+        
+        # Lists are stored as compact JSON
+        db_cursor.execute("SELECT related_keywords FROM keywords WHERE keyword = ?", ("test",))
+        assert db_cursor.fetchone()[0] == '["keyword1","keyword2","keyword3"]'
     
-    def test_database_connection_error_handling(self, temp_db):
+    def test_database_connection_error_handling(self, monkeypatch):
         """Test handling of database connection errors"""
-        # Try to create database manager with invalid path
-        import os
-        os.chmod(temp_db, 0o000)  # Remove all permissions
-        
-        try:
-            db_manager = DatabaseManager(temp_db)
-            # This should handle the error gracefully
-            assert True
-        except Exception as e:
-            # If exception is raised, it should be handled properly
-            assert "permission" in str(e).lower() or "access" in str(e).lower()
-        finally:
-            os.chmod(temp_db, 0o644)  # Restore permissions
+        def refuse(*args, **kwargs):
+            raise sqlite3.OperationalError("unable to open database file")
+        monkeypatch.setattr("database.sqlite3.connect", refuse)
+        
+        with pytest.raises(sqlite3.OperationalError, match="unable to open"):
+            DatabaseManager("unreachable.db")
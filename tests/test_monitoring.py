@@ -0,0 +1,346 @@
+"""
+Tests for metrics storage, alerting and health checks
+"""
+import pytest
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import monitoring
+from monitoring import MetricsCollector, AlertManager, HealthChecker, SystemMetrics, ScrapingMetrics
+
+
+@pytest.fixture
+def old_schema_db(tmp_path):
+    """metrics.db as written before timestamps became epoch seconds"""
+    db_path = str(tmp_path / "metrics.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE system_metrics (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT,
+            cpu_usage REAL,
+            memory_usage REAL,
+            disk_usage REAL,
+            network_io TEXT,
+            active_tasks INTEGER,
+            database_size REAL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE scraping_metrics (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT,
+            urls_processed INTEGER,
+            keywords_analyzed INTEGER,
+            errors_count INTEGER,
+            success_rate REAL,
+            avg_response_time REAL,
+            cache_hit_rate REAL
+        )
+    ''')
+    
+    now = datetime.now()
+    for age_days in (1, 60):
+        timestamp = (now - timedelta(days=age_days)).isoformat()
+        conn.execute(
+            "INSERT INTO system_metrics (timestamp, cpu_usage, memory_usage, disk_usage, network_io, active_tasks, database_size) "
+            "VALUES (?, 10.0, 20.0, 30.0, ?, 1, 0.5)",
+            (timestamp, '{"bytes_sent": 100, "bytes_recv": 200}')
+        )
+        conn.execute(
+            "INSERT INTO scraping_metrics (timestamp, urls_processed, keywords_analyzed, errors_count, success_rate, avg_response_time, cache_hit_rate) "
+            "VALUES (?, 5, 3, 0, 100.0, 1.5, 50.0)",
+            (timestamp,)
+        )
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+@pytest.fixture
+def collector(old_schema_db):
+    """Collector opened on the old-schema database, which runs the migration"""
+    collector = MetricsCollector(old_schema_db)
+    yield collector
+    collector._conn.close()
+
+
+@pytest.fixture
+def new_collector(tmp_path):
+    """Collector on a fresh metrics database"""
+    collector = MetricsCollector(str(tmp_path / "metrics.db"))
+    yield collector
+    collector.stop_collection()
+    collector._conn.close()
+
+
+@pytest.fixture
+def alert_manager(new_collector):
+    """Alert manager attached to the fresh collector"""
+    manager = AlertManager(new_collector)
+    manager.start_monitoring()
+    yield manager
+    manager.stop_monitoring()
+
+
+def system_metrics(cpu_usage: float = 10.0, memory_usage: float = 20.0, disk_usage: float = 30.0) -> SystemMetrics:
+    """System snapshot with the given resource usage"""
+    return SystemMetrics(
+        timestamp=time.time(),
+        cpu_usage=cpu_usage,
+        memory_usage=memory_usage,
+        disk_usage=disk_usage,
+        bytes_sent=0,
+        bytes_recv=0,
+        active_tasks=1,
+        database_size=0.0
+    )
+
+
+def wait_until(predicate, timeout: float = 2.0):
+    """Poll until predicate() is true"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        time.sleep(0.005)
+
+
+class TestCollectorAlerts:
+    """Tests for alerts evaluated from the collection loop"""
+    
+    def test_loop_raises_alert_from_fresh_snapshot(self, new_collector, alert_manager, monkeypatch):
+        """Test that a collected snapshot over a threshold raises its alert"""
+        monkeypatch.setattr(new_collector, "_collect_system_metrics", lambda: system_metrics(cpu_usage=95.0))
+        new_collector.collection_interval = 0.01
+        
+        new_collector.start_collection()
+        wait_until(lambda: alert_manager.get_active_alerts())
+        new_collector.stop_collection()
+        
+        assert [alert.message for alert in alert_manager.get_active_alerts()] == ["High CPU usage: 95.0%"]
+    
+    def test_failed_collection_skips_stale_snapshot(self, new_collector, alert_manager, monkeypatch):
+        """Test that a failed collection doesn't re-check the previous snapshot"""
+        new_collector.system_metrics.append(system_metrics(cpu_usage=95.0))
+        collected = []
+        
+        def failing_collection():
+            collected.append(True)
+            return None
+        
+        monkeypatch.setattr(new_collector, "_collect_system_metrics", failing_collection)
+        new_collector.collection_interval = 0.01
+        
+        new_collector.start_collection()
+        wait_until(lambda: len(collected) >= 3)
+        new_collector.stop_collection()
+        
+        assert alert_manager.get_active_alerts() == []
+
+
+def scraping_metrics(urls_processed: int = 10, errors_count: int = 0) -> ScrapingMetrics:
+    """Scraping snapshot for the given request and error counts"""
+    return ScrapingMetrics(
+        timestamp=time.time(),
+        urls_processed=urls_processed,
+        keywords_analyzed=0,
+        errors_count=errors_count,
+        success_rate=(urls_processed - errors_count) / urls_processed * 100,
+        avg_response_time=1.0,
+        cache_hit_rate=0.0
+    )
+
+
+class TestAlertThresholds:
+    """Tests for configuring alert thresholds"""
+    
+    def test_lowered_threshold_raises_alert(self, alert_manager):
+        """Test that a lowered CPU threshold alerts on usage the default allows"""
+        alert_manager._check_system_alerts(system_metrics(cpu_usage=60.0))
+        assert alert_manager.get_active_alerts() == []
+        
+        alert_manager.configure_thresholds(cpu_usage=50)
+        alert_manager._check_system_alerts(system_metrics(cpu_usage=60.0))
+        
+        assert [alert.message for alert in alert_manager.get_active_alerts()] == ["High CPU usage: 60.0%"]
+    
+    def test_raised_threshold_silences_alert(self, alert_manager):
+        """Test that raising the disk threshold stops a critical disk alert"""
+        alert_manager.configure_thresholds(disk_usage=99)
+        alert_manager._check_system_alerts(system_metrics(disk_usage=95.0))
+        
+        assert alert_manager.get_active_alerts() == []
+    
+    def test_scraping_thresholds(self, alert_manager):
+        """Test that the error and success rate thresholds are applied to scraping metrics"""
+        # 15% errors: over the default 10% error rate and under the 90% success rate
+        alert_manager.configure_thresholds(error_rate=20, success_rate_low=80)
+        alert_manager._check_scraping_alerts(scraping_metrics(urls_processed=20, errors_count=3))
+        assert alert_manager.get_active_alerts() == []
+        
+        alert_manager.configure_thresholds(error_rate=10)
+        alert_manager._check_scraping_alerts(scraping_metrics(urls_processed=20, errors_count=3))
+        assert [alert.message for alert in alert_manager.get_active_alerts()] == ["High error rate: 15.0%"]
+    
+    def test_unknown_threshold_rejected(self, alert_manager):
+        """Test that a misspelled metric name raises instead of being silently ignored"""
+        with pytest.raises(ValueError, match="cpu_usge"):
+            alert_manager.configure_thresholds(cpu_usge=50, memory_usage=50)
+        
+        # Nothing from the rejected call was applied
+        assert alert_manager.alert_thresholds['memory_usage'] == 85.0
+        assert 'cpu_usge' not in alert_manager.alert_thresholds
+    
+    def test_bad_value_leaves_thresholds_unchanged(self, alert_manager):
+        """Test that a non-numeric threshold is rejected before anything is updated"""
+        with pytest.raises(ValueError):
+            alert_manager.configure_thresholds(cpu_usage=50, memory_usage="high")
+        
+        assert alert_manager.alert_thresholds['cpu_usage'] == 80.0
+        alert_manager._check_system_alerts(system_metrics(cpu_usage=60.0))
+        assert alert_manager.get_active_alerts() == []
+
+
+@pytest.fixture
+def health_checker(new_collector, alert_manager, tmp_path, monkeypatch):
+    """Health checker probing a small scraper database in the test directory"""
+    db_path = str(tmp_path / "seo.db")
+    sqlite3.connect(db_path).close()
+    monkeypatch.setattr(monitoring.config, "db_path", db_path)
+    checker = HealthChecker(new_collector, alert_manager)
+    yield checker
+    if checker._db_conn is not None:
+        checker._db_conn.close()
+
+
+class TestHealthAggregation:
+    """Tests for combining component health into the overall status"""
+    
+    def test_all_healthy(self, health_checker, new_collector):
+        """Test that healthy components give a healthy overall status"""
+        new_collector.system_metrics.append(system_metrics())
+        new_collector.scraping_metrics.append(scraping_metrics())
+        
+        health = health_checker.check_health()
+        
+        assert {name: c['status'] for name, c in health['components'].items()} == {
+            'system': 'healthy', 'scraping': 'healthy', 'database': 'healthy', 'alerts': 'healthy'
+        }
+        assert health['overall_status'] == 'healthy'
+    
+    def test_one_warning_degrades_overall(self, health_checker, new_collector):
+        """Test that a single component in warning makes the overall status a warning"""
+        new_collector.system_metrics.append(system_metrics(memory_usage=90.0))
+        new_collector.scraping_metrics.append(scraping_metrics())
+        
+        health = health_checker.check_health()
+        
+        assert health['components']['system']['issues'] == ["Memory usage high: 90.0%"]
+        assert health['components']['scraping']['status'] == 'healthy'
+        assert health['overall_status'] == 'warning'
+    
+    def test_critical_outranks_warning(self, health_checker, new_collector):
+        """Test that the most severe component decides the overall status"""
+        new_collector.system_metrics.append(system_metrics())
+        # 85% success is a scraping warning; the critical one comes from the system
+        new_collector.scraping_metrics.append(scraping_metrics(urls_processed=20, errors_count=3))
+        new_collector.system_metrics.append(system_metrics(cpu_usage=95.0))
+        
+        health = health_checker.check_health()
+        
+        assert health['components']['scraping']['status'] == 'warning'
+        assert health['components']['system']['status'] == 'critical'
+        assert health['overall_status'] == 'critical'
+    
+    @pytest.mark.parametrize("cpu_usage, memory_usage", [(95.0, 88.0), (85.0, 97.0)])
+    def test_system_severity_is_maximum(self, health_checker, new_collector, cpu_usage, memory_usage):
+        """Test that a later warning check doesn't lower an earlier critical one, and vice versa"""
+        new_collector.system_metrics.append(system_metrics(cpu_usage=cpu_usage, memory_usage=memory_usage))
+        
+        system = health_checker._check_system_health()
+        
+        assert system['status'] == 'critical'
+        assert len(system['issues']) == 2
+    
+    def test_unknown_component_does_not_degrade(self, health_checker):
+        """Test that components without metrics yet are unknown without affecting the overall status"""
+        health = health_checker.check_health()
+        
+        assert health['components']['system']['status'] == 'unknown'
+        assert health['overall_status'] == 'healthy'
+
+
+class TestDatabaseHealth:
+    """Tests for the health checker's persistent database connection"""
+    
+    def test_connection_reused(self, health_checker):
+        """Test that consecutive checks probe over the same connection"""
+        assert health_checker._check_database_health()['status'] == 'healthy'
+        conn = health_checker._db_conn
+        
+        assert health_checker._check_database_health()['status'] == 'healthy'
+        assert health_checker._db_conn is conn
+    
+    def test_broken_connection_reported_then_recovers(self, health_checker):
+        """Test that a dead connection fails one check and is replaced on the next"""
+        health_checker._check_database_health()
+        broken = health_checker._db_conn
+        broken.close()
+        
+        failed = health_checker._check_database_health()
+        assert failed['status'] == 'critical'
+        assert failed['issues'][0].startswith("Database error:")
+        assert health_checker._db_conn is None
+        
+        recovered = health_checker._check_database_health()
+        assert recovered['status'] == 'healthy'
+        assert health_checker._db_conn is not None and health_checker._db_conn is not broken
+    
+    def test_unreachable_database_then_recovers(self, health_checker, tmp_path, monkeypatch):
+        """Test that a database that can't be opened is critical until it is reachable again"""
+        db_path = monitoring.config.db_path
+        monkeypatch.setattr(monitoring.config, "db_path", str(tmp_path / "missing" / "seo.db"))
+        
+        health = health_checker.check_health()
+        assert health['components']['database']['status'] == 'critical'
+        assert health['overall_status'] == 'critical'
+        
+        monkeypatch.setattr(monitoring.config, "db_path", db_path)
+        assert health_checker._check_database_health()['status'] == 'healthy'
+
+
+class TestMetricsStorageMigration:
+    """Tests for upgrading a metrics.db with ISO TEXT timestamps"""
+    
+    @pytest.mark.parametrize("table", ["system_metrics", "scraping_metrics"])
+    def test_timestamps_become_epoch_seconds(self, collector, table):
+        """Test that the column is REAL and old ISO rows were converted"""
+        columns = {row[1]: row[2] for row in collector._conn.execute(f"PRAGMA table_info({table})")}
+        assert columns["timestamp"] == "REAL"
+        
+        rows = collector._conn.execute(f"SELECT typeof(timestamp), timestamp FROM {table} ORDER BY id").fetchall()
+        assert [kind for kind, _ in rows] == ["real", "real"]
+        
+        ages = [(time.time() - timestamp) / 86400 for _, timestamp in rows]
+        assert ages == [pytest.approx(1, abs=0.01), pytest.approx(60, abs=0.01)]
+    
+    def test_network_io_moved_to_byte_columns(self, collector):
+        """Test that the JSON network counters were carried over"""
+        rows = collector._conn.execute("SELECT bytes_sent, bytes_recv FROM system_metrics").fetchall()
+        assert rows == [(100, 200), (100, 200)]
+    
+    def test_prune_removes_migrated_old_rows(self, collector):
+        """Test that rows older than the retention window are pruned after migration"""
+        collector.prune_old_metrics()
+        
+        for table in ("system_metrics", "scraping_metrics"):
+            assert collector._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 1
+    
+    def test_migration_runs_once(self, old_schema_db, collector):
+        """Test that reopening an upgraded database keeps its rows"""
+        reopened = MetricsCollector(old_schema_db)
+        try:
+            assert reopened._conn.execute("SELECT COUNT(*) FROM system_metrics").fetchone()[0] == 2
+        finally:
+            reopened._conn.close()
@@ -0,0 +1,627 @@
+"""
+Tests for the task scheduler
+"""
+import pytest
+import asyncio
+import json
+import math
+import os
+import pickle
+import time
+from dataclasses import asdict
+from datetime import datetime
+from types import SimpleNamespace
+
+import scheduler as scheduler_module
+from scheduler import (
+    TaskScheduler, ScheduledTask, TaskStatus, TaskPriority, _encode_task_value,
+    compute_retry_schedule, MIN_DURATION_SAMPLES
+)
+
+
+def make_task(task_id: str, **overrides) -> ScheduledTask:
+    """Pending interval task running the report function, with overridable fields"""
+    values = dict(
+        id=task_id,
+        name=f"Task {task_id}",
+        function="generate_report",
+        args=[],
+        kwargs={},
+        schedule_type="interval",
+        schedule_value=3600,
+        priority=TaskPriority.MEDIUM,
+        status=TaskStatus.PENDING,
+        created_at=datetime(2024, 1, 1).isoformat()
+    )
+    values.update(overrides)
+    return ScheduledTask(**values)
+
+
+@pytest.fixture
+def persist_file(tmp_path):
+    """Snapshot path in a per-test directory; the log sits next to it"""
+    return str(tmp_path / "tasks.json")
+
+
+@pytest.fixture
+def make_scheduler(persist_file):
+    """Build schedulers on a temporary snapshot, closing them afterwards"""
+    created = []
+    
+    def _make_scheduler():
+        scheduler = TaskScheduler(None, persist_file=persist_file)
+        created.append(scheduler)
+        return scheduler
+    
+    yield _make_scheduler
+    for scheduler in created:
+        if scheduler._loop_thread:
+            scheduler.stop_scheduler()
+        scheduler.close()
+
+
+def wait_until(predicate, timeout: float = 2.0):
+    """Poll from a plain thread until predicate() is true"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        time.sleep(0.005)
+
+
+async def async_wait_until(predicate, timeout: float = 2.0):
+    """Poll from a coroutine, letting the loop run timers in between"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.005)
+
+
+def counting_function(fail_first: int = 0):
+    """Task function counting its calls, failing the first fail_first of them"""
+    calls = []
+    
+    async def run(*args, **kwargs):
+        calls.append(args)
+        if len(calls) <= fail_first:
+            raise RuntimeError("transient failure")
+        return {"call": len(calls)}
+    
+    return run, calls
+
+
+def write_snapshot(scheduler: TaskScheduler, persist_file: str, tasks: list):
+    """Write tasks to the snapshot file in the scheduler's own record format"""
+    with open(persist_file, 'w', encoding='utf-8') as f:
+        json.dump({task.id: scheduler._encode_task(task) for task in tasks}, f,
+                  default=_encode_task_value)
+
+
+class TestAddTask:
+    """Tests for adding tasks"""
+    
+    def test_invalid_schedule_is_not_stored(self, make_scheduler):
+        """Test that a task with a bad time of day is rejected before it is stored or persisted"""
+        scheduler = make_scheduler()
+        task = make_task("bad", schedule_type="daily", schedule_value="25:00")
+        
+        with pytest.raises(ValueError):
+            scheduler.add_task(task)
+        
+        assert "bad" not in scheduler.tasks
+        assert scheduler.list_tasks() == []
+        assert "bad" not in scheduler._dirty_ids
+    
+    def test_load_skips_bad_record(self, make_scheduler, persist_file):
+        """Test that a bad stored task doesn't stop the tasks after it from loading"""
+        writer = make_scheduler()
+        write_snapshot(writer, persist_file, [
+            make_task("first"),
+            make_task("bad", schedule_type="daily", schedule_value="25:00"),
+            make_task("last"),
+        ])
+        
+        scheduler = make_scheduler()
+        
+        assert sorted(scheduler.tasks) == ["first", "last"]
+        # The bad record is dropped from the rewritten snapshot
+        with open(persist_file, encoding='utf-8') as f:
+            assert sorted(json.load(f)) == ["first", "last"]
+
+
+class TestTimers:
+    """Tests for the event-loop timer engine"""
+    
+    @pytest.mark.asyncio
+    async def test_interval_rearms_until_max_runs(self, make_scheduler):
+        """Test that an interval task re-arms after each run and stops at max_runs"""
+        scheduler = make_scheduler()
+        run, calls = counting_function()
+        scheduler.task_functions["generate_report"] = run
+        
+        await scheduler.start()
+        task_id = scheduler.add_task(make_task("interval", schedule_value=0.01, max_runs=3))
+        
+        # The fire after the third run finds max_runs reached and doesn't re-arm
+        await async_wait_until(lambda: scheduler.tasks[task_id].run_count == 3
+                               and task_id not in scheduler._handles)
+        await asyncio.sleep(0.05)
+        
+        assert len(calls) == 3
+        assert scheduler.tasks[task_id].status == TaskStatus.COMPLETED
+        await scheduler.stop()
+    
+    @pytest.mark.asyncio
+    async def test_once_task_runs_a_single_time(self, make_scheduler):
+        """Test that a 'once' task isn't re-armed after its run"""
+        scheduler = make_scheduler()
+        run, calls = counting_function()
+        scheduler.task_functions["generate_report"] = run
+        
+        await scheduler.start()
+        task_id = scheduler.add_task(make_task("once", schedule_type="once", schedule_value="12:00"))
+        # Fire it now instead of waiting for 12:00
+        scheduler._arm(task_id, 0)
+        
+        await async_wait_until(lambda: scheduler.tasks[task_id].run_count == 1)
+        await asyncio.sleep(0.02)
+        
+        assert len(calls) == 1
+        assert task_id not in scheduler._handles
+        await scheduler.stop()
+    
+    @pytest.mark.asyncio
+    async def test_stop_defers_fires_until_restart(self, make_scheduler):
+        """Test that timers coming due while stopped run once start() is called again"""
+        scheduler = make_scheduler()
+        run, calls = counting_function()
+        scheduler.task_functions["generate_report"] = run
+        
+        await scheduler.start()
+        task_id = scheduler.add_task(make_task("deferred", schedule_value=0.01, max_runs=1))
+        await scheduler.stop()
+        
+        await async_wait_until(lambda: scheduler._due)
+        assert calls == []
+        
+        await scheduler.start()
+        await async_wait_until(lambda: scheduler.tasks[task_id].run_count == 1)
+        await scheduler.stop()
+    
+    def test_threaded_stop_and_restart(self, make_scheduler):
+        """Test stopping and restarting a scheduler running on its own loop thread"""
+        scheduler = make_scheduler()
+        run, calls = counting_function()
+        scheduler.task_functions["generate_report"] = run
+        
+        scheduler.start_scheduler()
+        task_id = scheduler.add_task(make_task("threaded", schedule_value=0.01))
+        wait_until(lambda: scheduler.tasks[task_id].run_count >= 1)
+        
+        scheduler.stop_scheduler()
+        assert not scheduler._loop_thread
+        stopped_at = len(calls)
+        time.sleep(0.05)
+        assert len(calls) == stopped_at
+        
+        scheduler.start_scheduler()
+        wait_until(lambda: len(calls) > stopped_at)
+
+
+class TestRetries:
+    """Tests for retry placement"""
+    
+    def test_schedule_needs_enough_samples(self):
+        """Test that too few run times give no adaptive schedule"""
+        assert compute_retry_schedule([1.0] * (MIN_DURATION_SAMPLES - 1), 3) is None
+        assert compute_retry_schedule([2.0] * MIN_DURATION_SAMPLES, 3) is None  # no spread
+        assert compute_retry_schedule([1.0, 2.0, 3.0, 4.0, 5.0], 0) is None
+    
+    def test_schedule_ends_on_quantile(self):
+        """Test that retries increase and the last one lands on the run-time quantile"""
+        durations = [1.0, 1.5, 2.0, 2.5, 3.0, 4.0, 6.0]
+        
+        schedule = compute_retry_schedule(durations, 3, quantile=0.99)
+        
+        logs = [math.log(d) for d in durations]
+        dist = scheduler_module.NormalDist.from_samples(logs)
+        assert len(schedule) == 3
+        assert schedule == sorted(schedule) and schedule[0] > 0
+        assert schedule[-1] == pytest.approx(math.exp(dist.inv_cdf(0.99)))
+    
+    @pytest.mark.asyncio
+    async def test_retry_delays_follow_schedule(self, make_scheduler):
+        """Test that successive retries wait the gaps between scheduled offsets"""
+        scheduler = make_scheduler()
+        await scheduler.start()
+        scheduler._run_durations["generate_report"].extend([1.0, 1.5, 2.0, 2.5, 3.0, 4.0])
+        task = make_task("retry", max_retries=3)
+        
+        task.retry_count = 1
+        first = scheduler._schedule_retry(task)
+        task.retry_count = 2
+        second = scheduler._schedule_retry(task)
+        
+        assert first == pytest.approx(task.retry_schedule[0])
+        assert second == pytest.approx(task.retry_schedule[1] - task.retry_schedule[0])
+        # Only the latest retry stays armed
+        assert list(scheduler._retry_handles) == ["retry"]
+        scheduler._disarm("retry")
+        await scheduler.stop()
+    
+    @pytest.mark.asyncio
+    async def test_failed_run_is_retried(self, make_scheduler):
+        """Test that a failing run is retried after retry_delay without adaptive data"""
+        scheduler = make_scheduler()
+        scheduler.retry_delay = 0.01
+        run, calls = counting_function(fail_first=1)
+        scheduler.task_functions["generate_report"] = run
+        
+        await scheduler.start()
+        task_id = scheduler.add_task(make_task("flaky", schedule_value=3600))
+        scheduler._arm(task_id, 0)
+        
+        await async_wait_until(lambda: scheduler.tasks[task_id].run_count == 1)
+        
+        task = scheduler.tasks[task_id]
+        assert len(calls) == 2
+        assert task.retry_count == 0
+        assert task.status == TaskStatus.COMPLETED
+        scheduler._disarm(task_id)
+        await scheduler.stop()
+    
+    @pytest.mark.asyncio
+    async def test_retry_holds_back_regular_fires(self, make_scheduler):
+        """Test that a recurring task's timer waits for its retries so runs never overlap"""
+        scheduler = make_scheduler()
+        scheduler.retry_delay = 0.05
+        run, calls = counting_function(fail_first=1)
+        scheduler.task_functions["generate_report"] = run
+        
+        await scheduler.start()
+        task_id = scheduler.add_task(make_task("recurring", schedule_value=0.01))
+        
+        await async_wait_until(lambda: task_id in scheduler._retry_handles)
+        assert task_id not in scheduler._handles
+        # Several intervals pass while the retry is pending without another run
+        await asyncio.sleep(0.03)
+        assert len(calls) == 1
+        
+        await async_wait_until(lambda: scheduler.tasks[task_id].run_count >= 1)
+        assert scheduler.tasks[task_id].retry_count == 0
+        # The retry chain is over, so the regular timer is back
+        await async_wait_until(lambda: task_id in scheduler._handles)
+        scheduler.remove_task(task_id)
+        await scheduler.stop()
+    
+    @pytest.mark.asyncio
+    async def test_fire_skipped_while_running(self, make_scheduler):
+        """Test that a fire arriving during a run doesn't start a second one"""
+        scheduler = make_scheduler()
+        gate = asyncio.Event()
+        calls = []
+        
+        async def slow(*args, **kwargs):
+            calls.append(args)
+            await gate.wait()
+            return {}
+        
+        scheduler.task_functions["generate_report"] = slow
+        await scheduler.start()
+        task_id = scheduler.add_task(make_task("busy", schedule_value=3600))
+        scheduler._arm(task_id, 0)
+        await async_wait_until(lambda: task_id in scheduler.running_tasks)
+        run = scheduler.running_tasks[task_id]
+        
+        # Returns at once instead of waiting on a second run
+        await asyncio.wait_for(scheduler._run_task(task_id), timeout=1)
+        
+        assert scheduler.running_tasks[task_id] is run
+        gate.set()
+        await async_wait_until(lambda: task_id not in scheduler.running_tasks)
+        assert len(calls) == 1
+        scheduler.remove_task(task_id)
+        await scheduler.stop()
+
+
+class TestCoalescing:
+    """Tests for sharing identical in-flight runs"""
+    
+    @pytest.mark.asyncio
+    async def test_identical_runs_share_one_call(self, make_scheduler):
+        """Test that overlapping runs with the same function and arguments call it once"""
+        scheduler = make_scheduler()
+        gate = asyncio.Event()
+        calls = []
+        
+        async def slow(*args, **kwargs):
+            calls.append(args)
+            await gate.wait()
+            return {"value": 42}
+        
+        first = make_task("a", args=["https://example.com"])
+        second = make_task("b", args=["https://example.com"])
+        other = make_task("c", args=["https://other.com"])
+        
+        runs = [asyncio.ensure_future(scheduler._run_coalesced(task, slow))
+                for task in (first, second, other)]
+        await async_wait_until(lambda: len(scheduler._inflight) == 2)
+        gate.set()
+        results = await asyncio.gather(*runs)
+        
+        assert calls == [("https://example.com",), ("https://other.com",)]
+        assert results == [{"value": 42}] * 3
+        assert scheduler._inflight == {}
+    
+    @pytest.mark.asyncio
+    async def test_joined_run_times_out_alone(self, make_scheduler):
+        """Test that a joining run timing out doesn't cancel the shared call"""
+        scheduler = make_scheduler()
+        gate = asyncio.Event()
+        
+        async def slow(*args, **kwargs):
+            await gate.wait()
+            return "done"
+        
+        owner = asyncio.ensure_future(scheduler._run_coalesced(make_task("a", timeout=5), slow))
+        await async_wait_until(lambda: scheduler._inflight)
+        
+        with pytest.raises(asyncio.TimeoutError):
+            await scheduler._run_coalesced(make_task("b", timeout=0.01), slow)
+        
+        gate.set()
+        assert await owner == "done"
+
+
+class TestBulkBatching:
+    """Tests for merging bulk URL analyses"""
+    
+    @pytest.mark.asyncio
+    async def test_bulk_requests_merge_per_keyword_set(self, make_scheduler, monkeypatch):
+        """Test that queued bulk analyses with the same keywords run as one batch"""
+        batches = []
+        
+        class FakeAnalyzer:
+            def __init__(self, db_manager):
+                pass
+            
+            async def analyze_multiple_urls(self, urls, keywords=None):
+                batches.append((urls, keywords))
+                return [SimpleNamespace(url=url) for url in urls]
+        
+        monkeypatch.setattr(scheduler_module, "AsyncContentAnalyzer", FakeAnalyzer)
+        scheduler = make_scheduler()
+        
+        results = await asyncio.gather(
+            scheduler._bulk_url_analysis_task(["https://a.com", "https://b.com"], ["seo"]),
+            scheduler._bulk_url_analysis_task(["https://b.com", "https://c.com"], ["seo"]),
+            scheduler._bulk_url_analysis_task(["https://d.com"]),
+        )
+        await scheduler._stop_bulk_worker()
+        
+        assert sorted(batches, key=str) == sorted([
+            (["https://a.com", "https://b.com", "https://c.com"], ["seo"]),
+            (["https://d.com"], None),
+        ], key=str)
+        assert [r["urls_analyzed"] for r in results] == [2, 2, 1]
+    
+    @pytest.mark.asyncio
+    async def test_batch_failure_answers_every_request(self, make_scheduler, monkeypatch):
+        """Test that an error while grouping a batch fails its requests and spares the worker"""
+        class FakeAnalyzer:
+            def __init__(self, db_manager):
+                pass
+            
+            async def analyze_multiple_urls(self, urls, keywords=None):
+                return [SimpleNamespace(url=url) for url in urls]
+        
+        monkeypatch.setattr(scheduler_module, "AsyncContentAnalyzer", FakeAnalyzer)
+        scheduler = make_scheduler()
+        
+        # An unhashable keyword can't be grouped on
+        results = await asyncio.wait_for(asyncio.gather(
+            scheduler._bulk_url_analysis_task(["https://a.com"], [["nested"]]),
+            scheduler._bulk_url_analysis_task(["https://b.com"], ["seo"]),
+            return_exceptions=True,
+        ), timeout=1)
+        
+        assert all(isinstance(result, TypeError) for result in results)
+        worker = scheduler._bulk_worker_task
+        assert not worker.done()
+        
+        result = await asyncio.wait_for(scheduler._bulk_url_analysis_task(["https://c.com"]), timeout=1)
+        assert result["urls_analyzed"] == 1
+        assert scheduler._bulk_worker_task is worker
+        await scheduler.stop()
+    
+    @pytest.mark.asyncio
+    async def test_stop_cancels_worker(self, make_scheduler, monkeypatch):
+        """Test that stopping the scheduler cancels the worker and the requests it holds"""
+        started = asyncio.Event()
+        
+        class StuckAnalyzer:
+            def __init__(self, db_manager):
+                pass
+            
+            async def analyze_multiple_urls(self, urls, keywords=None):
+                started.set()
+                await asyncio.Event().wait()
+        
+        monkeypatch.setattr(scheduler_module, "AsyncContentAnalyzer", StuckAnalyzer)
+        scheduler = make_scheduler()
+        await scheduler.start()
+        
+        request = asyncio.ensure_future(scheduler._bulk_url_analysis_task(["https://a.com"]))
+        await asyncio.wait_for(started.wait(), timeout=1)
+        worker = scheduler._bulk_worker_task
+        await scheduler.stop()
+        
+        assert worker.cancelled()
+        assert scheduler._bulk_worker_task is None
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(request, timeout=1)
+
+
+class TestPersistence:
+    """Tests for the snapshot and append-only task log"""
+    
+    def test_log_replayed_over_snapshot(self, make_scheduler, persist_file):
+        """Test that logged changes since the last snapshot are restored, then compacted"""
+        writer = make_scheduler()
+        writer.persist_delay = 3600  # keep the background thread out of the way; flush by hand
+        writer.add_task(make_task("kept"))
+        writer.add_task(make_task("removed"))
+        writer._compact()
+        
+        writer.tasks["kept"].run_count = 7
+        writer._mark_dirty("kept")
+        writer.remove_task("removed")
+        writer.add_task(make_task("added"))
+        writer._append_log()
+        assert writer._log_records == 3
+        
+        # A crash mid-write leaves a torn final line, which is ignored
+        with open(f"{persist_file}.log", 'a', encoding='utf-8') as f:
+            f.write('["torn",{"id":"to')
+        
+        reader = make_scheduler()
+        
+        assert sorted(reader.tasks) == ["added", "kept"]
+        assert reader.tasks["kept"].run_count == 7
+        assert reader.tasks["kept"].priority is TaskPriority.MEDIUM
+        # Replaying folded the log into the snapshot
+        with open(f"{persist_file}.log", encoding='utf-8') as f:
+            assert f.read() == ""
+        with open(persist_file, encoding='utf-8') as f:
+            assert sorted(json.load(f)) == ["added", "kept"]
+    
+    def test_log_compacts_after_threshold(self, make_scheduler, persist_file):
+        """Test that the log is folded into the snapshot after compact_every records"""
+        scheduler = make_scheduler()
+        scheduler.persist_delay = 3600  # flush by hand below
+        scheduler.compact_every = 3
+        
+        for i in range(2):
+            scheduler.add_task(make_task(f"task_{i}"))
+        scheduler._append_log()
+        assert scheduler._log_records == 2
+        
+        scheduler.add_task(make_task("task_2"))
+        scheduler._append_log()
+        
+        assert scheduler._log_records == 0
+        with open(persist_file, encoding='utf-8') as f:
+            assert sorted(json.load(f)) == ["task_0", "task_1", "task_2"]
+        with open(f"{persist_file}.log", encoding='utf-8') as f:
+            assert f.read() == ""
+    
+    def test_legacy_pickle_is_migrated(self, make_scheduler, persist_file, tmp_path):
+        """Test that tasks pickled by older versions are imported into the JSON snapshot once"""
+        legacy_file = tmp_path / "tasks.pkl"
+        old_tasks = {}
+        for task in (make_task("daily", schedule_type="daily", schedule_value="09:00"),
+                     make_task("done", status=TaskStatus.COMPLETED)):
+            # The old format: asdict() with enum values, before retry_schedule existed
+            task_dict = asdict(task)
+            del task_dict['retry_schedule']
+            task_dict['priority'] = task.priority.value
+            task_dict['status'] = task.status.value
+            old_tasks[task.id] = task_dict
+        with open(legacy_file, 'wb') as f:
+            pickle.dump(old_tasks, f)
+        
+        scheduler = make_scheduler()
+        
+        assert sorted(scheduler.tasks) == ["daily", "done"]
+        assert scheduler.tasks["done"].status is TaskStatus.COMPLETED
+        with open(persist_file, encoding='utf-8') as f:
+            assert sorted(json.load(f)) == ["daily", "done"]
+        assert not legacy_file.exists()
+        assert os.path.exists(f"{legacy_file}.migrated")
+    
+    def test_legacy_pickle_ignored_once_snapshot_exists(self, make_scheduler, tmp_path, caplog):
+        """Test that a leftover pickle doesn't override the JSON snapshot"""
+        writer = make_scheduler()
+        writer.add_task(make_task("current"))
+        writer.close()
+        with open(tmp_path / "tasks.pkl", 'wb') as f:
+            pickle.dump({"stale": {}}, f)
+        
+        scheduler = make_scheduler()
+        
+        assert sorted(scheduler.tasks) == ["current"]
+        assert "Ignoring old task file" in caplog.text
+    
+    def test_close_flushes_and_stops_persist_thread(self, make_scheduler, persist_file):
+        """Test that close() writes pending changes to the snapshot and releases the log"""
+        scheduler = make_scheduler()
+        scheduler.persist_delay = 3600  # only close() can flush this change
+        scheduler.add_task(make_task("pending"))
+        
+        scheduler.close()
+        
+        assert not scheduler._persist_thread.is_alive()
+        assert scheduler._log.closed
+        with open(persist_file, encoding='utf-8') as f:
+            assert sorted(json.load(f)) == ["pending"]
+        scheduler.close()  # closing twice is harmless
+    
+    @pytest.mark.asyncio
+    async def test_restart_reopens_log(self, make_scheduler):
+        """Test that starting a stopped scheduler resumes logging changes"""
+        scheduler = make_scheduler()
+        await scheduler.start()
+        await scheduler.stop()
+        assert scheduler._log.closed
+        
+        await scheduler.start()
+        scheduler.add_task(make_task("later"))
+        await async_wait_until(lambda: scheduler._log_records == 1)
+        await scheduler.stop()
+        
+        assert sorted(make_scheduler().tasks) == ["later"]
+    
+    def test_peek_top_orders_by_priority(self, make_scheduler):
+        """Test that the highest-priority tasks come first and removed ones are skipped"""
+        scheduler = make_scheduler()
+        scheduler.add_task(make_task("low", priority=TaskPriority.LOW))
+        scheduler.add_task(make_task("critical", priority=TaskPriority.CRITICAL))
+        scheduler.add_task(make_task("high", priority=TaskPriority.HIGH))
+        scheduler.remove_task("critical")
+        
+        assert [t.id for t in scheduler.peek_top(2)] == ["high", "low"]
+        assert [t.id for t in scheduler.list_tasks()] == ["high", "low"]
+    
+    def test_listing_leaves_index_untouched(self, make_scheduler):
+        """Test that listing reads the priority index without popping or reordering it"""
+        scheduler = make_scheduler()
+        for i, priority in enumerate(TaskPriority):
+            scheduler.add_task(make_task(f"task_{i}", priority=priority))
+        heap = list(scheduler._priority_heap)
+        
+        scheduler.list_tasks()
+        scheduler.peek_top(2)
+        
+        assert scheduler._priority_heap == heap
+    
+    def test_peek_top_looks_past_stale_and_filtered_entries(self, make_scheduler):
+        """Test that peek_top still finds k matches behind removed or filtered tasks"""
+        scheduler = make_scheduler()
+        for i in range(6):
+            scheduler.add_task(make_task(f"critical_{i}", priority=TaskPriority.CRITICAL))
+        scheduler.add_task(make_task("failed", priority=TaskPriority.HIGH, status=TaskStatus.FAILED))
+        scheduler.add_task(make_task("low", priority=TaskPriority.LOW))
+        for i in range(3):
+            scheduler.remove_task(f"critical_{i}")
+        
+        assert [t.id for t in scheduler.peek_top(1, TaskStatus.FAILED)] == ["failed"]
+        assert [t.id for t in scheduler.peek_top(4)] == ["critical_3", "critical_4", "critical_5", "failed"]
+        assert scheduler.peek_top(0) == []
+    
+    def test_index_rebuilt_when_mostly_stale(self, make_scheduler):
+        """Test that re-adding tasks doesn't grow the priority index without bound"""
+        scheduler = make_scheduler()
+        for _ in range(100):
+            scheduler.add_task(make_task("same"))
+        
+        assert len(scheduler._priority_heap) <= 2 * len(scheduler.tasks) + 16
+        assert [t.id for t in scheduler.list_tasks()] == ["same"]
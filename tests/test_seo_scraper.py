@@ -0,0 +1,197 @@
+"""
+Tests for the SEO scraper orchestration
+"""
+import pytest
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import seo_scraper
+from seo_scraper import SEOScraper
+
+
+class RecordingAnalyzer:
+    """Content analyzer stand-in recording each call and the thread it ran on"""
+    instances = []
+    
+    def __init__(self, db_manager):
+        self.calls = []
+        RecordingAnalyzer.instances.append(self)
+    
+    def analyze_content_enhanced(self, url, target_keywords=None):
+        self.calls.append(("content", url, target_keywords, threading.get_ident()))
+        return SimpleNamespace(kind="content", target_keywords=target_keywords)
+    
+    def perform_technical_seo_audit(self, url):
+        self.calls.append(("technical", url, None, threading.get_ident()))
+        return SimpleNamespace(kind="technical")
+
+
+@pytest.fixture
+def scraper(db_manager, monkeypatch):
+    """SEO scraper whose analysis stages are replaced by recording stand-ins"""
+    RecordingAnalyzer.instances = []
+    monkeypatch.setattr(seo_scraper, "ContentAnalyzer", RecordingAnalyzer)
+    scraper = SEOScraper(db_manager.db_path)
+    
+    scraper.keyword_calls = []
+    scraper.competitor_calls = []
+    
+    async def scrape_keyword(keyword):
+        scraper.keyword_calls.append(keyword)
+        return SimpleNamespace(related_keywords=[f"related {i}" for i in range(8)])
+    
+    def analyze_competitors(domain):
+        scraper.competitor_calls.append(domain)
+        return SimpleNamespace(domain=domain)
+    
+    scraper.keyword_scraper = SimpleNamespace(scrape_google_keywords_enhanced=scrape_keyword)
+    scraper.competitor_analyzer = SimpleNamespace(analyze_competitors=analyze_competitors)
+    return scraper
+
+
+def stage_calls():
+    """Calls made on the per-thread analyzers, in no particular order"""
+    return [call for analyzer in RecordingAnalyzer.instances for call in analyzer.calls]
+
+
+class TestAnalyzeComprehensive:
+    """Tests for the two concurrent analysis phases"""
+    
+    @pytest.mark.asyncio
+    async def test_both_phases_run(self, scraper):
+        """Test that phase two re-analyzes content with the keyword data and checks competitors"""
+        result = await scraper.analyze_comprehensive("https://www.example.com/page", "seo")
+        
+        target_keywords = ["seo"] + [f"related {i}" for i in range(5)]
+        assert sorted((call[:3] for call in stage_calls()), key=str) == sorted([
+            ("content", "https://www.example.com/page", None),
+            ("technical", "https://www.example.com/page", None),
+            ("content", "https://www.example.com/page", target_keywords),
+        ], key=str)
+        assert scraper.keyword_calls == ["seo"]
+        assert scraper.competitor_calls == ["example.com"]
+        # The re-analysis replaces the first content result
+        assert result['content_analysis'].target_keywords == target_keywords
+        assert result['technical_seo'].kind == "technical"
+        assert result['keyword_analysis'] is not None
+        assert result['competitor_analysis'].domain == "example.com"
+    
+    @pytest.mark.asyncio
+    async def test_skipped_stages_are_none(self, scraper):
+        """Test that stages without their input are skipped and left as None"""
+        result = await scraper.analyze_comprehensive("https://example.com")
+        
+        # No keyword: no keyword research and no re-analysis
+        assert sorted(call[0] for call in stage_calls()) == ["content", "technical"]
+        assert scraper.keyword_calls == []
+        assert result['keyword_analysis'] is None
+        assert result['content_analysis'].target_keywords is None
+        assert result['competitor_analysis'] is not None
+    
+    @pytest.mark.asyncio
+    async def test_keyword_only(self, scraper):
+        """Test that without a URL only the keyword is researched"""
+        result = await scraper.analyze_comprehensive(None, "seo")
+        
+        assert stage_calls() == []
+        assert scraper.keyword_calls == ["seo"]
+        assert scraper.competitor_calls == []
+        assert result['keyword_analysis'] is not None
+        assert result['content_analysis'] is None
+        assert result['technical_seo'] is None
+        assert result['competitor_analysis'] is None
+    
+    @pytest.mark.asyncio
+    async def test_competitors_skipped_without_page_results(self, scraper, monkeypatch):
+        """Test that competitors aren't analyzed when neither page stage found anything"""
+        monkeypatch.setattr(RecordingAnalyzer, "analyze_content_enhanced", lambda *args, **kwargs: None)
+        monkeypatch.setattr(RecordingAnalyzer, "perform_technical_seo_audit", lambda *args: None)
+        
+        result = await scraper.analyze_comprehensive("https://example.com", "seo")
+        
+        assert scraper.competitor_calls == []
+        assert result['competitor_analysis'] is None
+        assert result['content_analysis'] is None
+    
+    @pytest.mark.asyncio
+    async def test_failing_stage_fails_analysis(self, scraper, caplog):
+        """Test that an exception in any stage is logged and the analysis returns None"""
+        async def broken(keyword):
+            raise RuntimeError("search blocked")
+        
+        scraper.keyword_scraper = SimpleNamespace(scrape_google_keywords_enhanced=broken)
+        
+        assert await scraper.analyze_comprehensive("https://example.com", "seo") is None
+        assert "search blocked" in caplog.text
+    
+    @pytest.mark.asyncio
+    async def test_threads_use_their_own_analyzer(self, scraper):
+        """Test that concurrent page stages never share an analyzer (and its session) across threads"""
+        await scraper.analyze_comprehensive("https://example.com", "seo")
+        await scraper.analyze_comprehensive("https://example.org", "seo")
+        
+        # The analyzer built in __init__ on this thread isn't used by the stages
+        assert scraper.content_analyzer.calls == []
+        workers = [analyzer for analyzer in RecordingAnalyzer.instances if analyzer.calls]
+        threads = [{call[3] for call in analyzer.calls} for analyzer in workers]
+        assert all(len(ids) == 1 for ids in threads)
+        assert len(set.union(*threads)) == len(workers)
+        assert threading.get_ident() not in set.union(*threads)
+
+
+class TestTrackKeywordRankings:
+    """Tests for concurrent keyword ranking tracking"""
+    
+    @pytest.fixture
+    def tracked(self, scraper):
+        """Keyword scraper stand-in recording peak concurrency and failing on "bad" keywords"""
+        state = SimpleNamespace(active=0, peak=0, keywords=[])
+        
+        async def scrape_keyword(keyword):
+            state.active += 1
+            state.peak = max(state.peak, state.active)
+            try:
+                await asyncio.sleep(0.01)
+                state.keywords.append(keyword)
+                if keyword.startswith("bad"):
+                    raise RuntimeError(f"blocked on {keyword}")
+                return SimpleNamespace(keyword=keyword)
+            finally:
+                state.active -= 1
+        
+        scraper.keyword_scraper = SimpleNamespace(scrape_google_keywords_enhanced=scrape_keyword)
+        return state
+    
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self, scraper, tracked):
+        """Test that no more than `concurrency` searches run at once"""
+        keywords = [f"keyword {i}" for i in range(7)]
+        
+        assert await scraper.track_keyword_rankings_async(keywords, concurrency=3) is True
+        
+        assert tracked.peak == 3
+        assert sorted(tracked.keywords) == sorted(keywords)
+    
+    @pytest.mark.asyncio
+    async def test_failures_are_reported_per_keyword(self, scraper, tracked, caplog):
+        """Test that a failing keyword makes the result False without stopping the others"""
+        keywords = ["good 1", "bad 1", "good 2"]
+        
+        assert await scraper.track_keyword_rankings_async(keywords) is False
+        
+        assert sorted(tracked.keywords) == sorted(keywords)
+        errors = [record.getMessage() for record in caplog.records if record.levelname == "ERROR"]
+        assert errors == ["Error tracking keyword ranking for 'bad 1': blocked on bad 1"]
+    
+    def test_sync_wrapper_runs_its_own_loop(self, scraper, tracked):
+        """Test that the sync variant runs the async one when no loop is running"""
+        assert scraper.track_keyword_rankings(["keyword"]) is True
+        assert tracked.keywords == ["keyword"]
+    
+    @pytest.mark.asyncio
+    async def test_sync_wrapper_refuses_running_loop(self, scraper, tracked):
+        """Test that the sync variant points async callers at the async variant"""
+        with pytest.raises(RuntimeError, match="track_keyword_rankings_async"):
+            scraper.track_keyword_rankings(["keyword"])
+        assert tracked.keywords == []
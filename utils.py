@@ -1,80 +1,165 @@
 """
 Utility functions for error handling, retries, and common operations
 """
+import os
+import re
 import time
+import socket
 import random
 import logging
 import functools
+import itertools
+import threading
+from contextlib import contextmanager
 from typing import Callable, Any, Optional, List
 from datetime import datetime, timedelta
+from urllib.parse import urlparse
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
 logger = logging.getLogger(__name__)
 
-def retry_on_failure(max_retries: int = 3, delay: float = 1.0, backoff: float = 2.0, 
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# Basic punctuation clean_text keeps alongside word characters and whitespace
+_KEEP_PUNCTUATION = frozenset('.,!?;:-()[]{}"\'')
+
+class _DeleteTable(dict):
+    """str.translate table deleting special characters, filled in per character on first sight"""
+    
+    def __missing__(self, codepoint: int):
+        char = chr(codepoint)
+        # Same set as the regex [^\w\s...]: \w is alphanumerics plus underscore
+        if char.isalnum() or char == '_' or char.isspace() or char in _KEEP_PUNCTUATION:
+            self[codepoint] = codepoint
+        else:
+            self[codepoint] = None
+        return self[codepoint]
+
+_DEL_TABLE = _DeleteTable()
+
+_process = None
+
+_LARGE_DELTA = timedelta(days=999)
+
+def retry_on_failure(max_retries: int = 3, base: float = 1.0, cap: float = 30.0,
                     exceptions: tuple = (Exception,)):
     """
-    Decorator for retrying functions on failure with exponential backoff
+    Decorator for retrying functions on failure with decorrelated jitter backoff
     
     Args:
         max_retries: Maximum number of retry attempts
-        delay: Initial delay between retries in seconds
-        backoff: Multiplier for delay after each retry
+        base: Shortest delay between retries in seconds
+        cap: Longest delay between retries in seconds
         exceptions: Tuple of exceptions to catch and retry on
     """
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            current_delay = delay
-            last_exception = None
+            sleep = base
             
             for attempt in range(max_retries + 1):
                 try:
                     return func(*args, **kwargs)
                 except exceptions as e:
-                    last_exception = e
                     if attempt == max_retries:
                         logger.error(f"Function {func.__name__} failed after {max_retries} retries: {e}")
-                        raise e
+                        raise
                     
-                    logger.warning(f"Attempt {attempt + 1} failed for {func.__name__}: {e}. Retrying in {current_delay:.2f}s")
-                    time.sleep(current_delay + random.uniform(0, 1))  # Add jitter
-                    current_delay *= backoff
-            
-            raise last_exception
+                    # Each delay is drawn from [base, 3 * previous delay], so workers that
+                    # failed together spread out instead of retrying in lockstep
+                    sleep = min(cap, random.uniform(base, sleep * 3))
+                    logger.warning(f"Attempt {attempt + 1} failed for {func.__name__}: {e}. Retrying in {sleep:.2f}s")
+                    time.sleep(sleep)
         return wrapper
     return decorator
 
-def rate_limit(calls_per_second: float = 1.0):
+def rate_limit(calls_per_second: float = 1.0, burst: Optional[float] = None):
     """
-    Decorator to rate limit function calls
+    Decorator to rate limit function calls with a token bucket
     
     Args:
-        calls_per_second: Maximum number of calls per second
+        calls_per_second: Average number of calls allowed per second
+        burst: Number of calls that may run back to back after an idle
+            period (defaults to calls_per_second, and is at least 1)
     """
-    min_interval = 1.0 / calls_per_second
-    last_called = [0.0]
+    capacity = max(1.0, burst or calls_per_second)
+    tokens = capacity
+    last_refill = time.monotonic()
+    lock = threading.Lock()
     
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            elapsed = time.time() - last_called[0]
-            left_to_wait = min_interval - elapsed
-            if left_to_wait > 0:
-                time.sleep(left_to_wait)
-            ret = func(*args, **kwargs)
-            last_called[0] = time.time()
-            return ret
+            nonlocal tokens, last_refill
+            while True:
+                with lock:
+                    now = time.monotonic()
+                    tokens = min(capacity, tokens + (now - last_refill) * calls_per_second)
+                    last_refill = now
+                    if tokens >= 1:
+                        tokens -= 1
+                        break
+                    sleep_for = (1 - tokens) / calls_per_second
+                # Sleep outside the lock so other callers can keep refilling
+                time.sleep(sleep_for)
+            return func(*args, **kwargs)
         return wrapper
     return decorator
 
+# DNS caching for new pooled connections (same TTL as the aiohttp client's ttl_dns_cache)
+_DNS_CACHE_TTL = 300.0
+_DNS_CACHE_SIZE = 1024
+_dns_cache = {}
+_system_getaddrinfo = socket.getaddrinfo
+
+def _cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    """socket.getaddrinfo that reuses successful lookups for _DNS_CACHE_TTL seconds"""
+    key = (host, port, family, type, proto, flags)
+    now = time.monotonic()
+    # Single dict get/set calls are atomic under the GIL, so threads can share the cache
+    entry = _dns_cache.get(key)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    
+    addresses = _system_getaddrinfo(host, port, family, type, proto, flags)
+    if len(_dns_cache) >= _DNS_CACHE_SIZE:
+        _dns_cache.clear()
+    _dns_cache[key] = (now + _DNS_CACHE_TTL, addresses)
+    return addresses
+
+def _install_dns_cache():
+    """Route socket.getaddrinfo (used by urllib3 to open connections) through the cache
+    
+    This patches the socket module for the whole process, so it also applies to aiohttp,
+    asyncio and anything else resolving names, and it stays until _uninstall_dns_cache().
+    """
+    if socket.getaddrinfo is not _cached_getaddrinfo:
+        socket.getaddrinfo = _cached_getaddrinfo
+
+def _uninstall_dns_cache():
+    """Put the system socket.getaddrinfo back and forget cached lookups"""
+    if socket.getaddrinfo is _cached_getaddrinfo:
+        socket.getaddrinfo = _system_getaddrinfo
+    _dns_cache.clear()
+
 class RobustSession:
     """Enhanced requests session with retry logic and error handling"""
     
+    __slots__ = ('session', 'timeout', 'user_agents', '_ua_cycle')
+    
     def __init__(self, max_retries: int = 3, backoff_factor: float = 0.3, 
-                 timeout: int = 30, user_agents: List[str] = None):
+                 timeout: int = 30, user_agents: List[str] = None, cache_dns: bool = False):
+        # Opt-in: the cache is process-wide and ignores the records' real TTLs
+        if cache_dns:
+            _install_dns_cache()
+        
         self.session = requests.Session()
         self.timeout = timeout
         self.user_agents = user_agents or [
@@ -83,16 +168,29 @@ class RobustSession:
             'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         ]
         
+        # Rotate through a per-session shuffled order rather than drawing at random per request
+        rotation = list(self.user_agents)
+        random.shuffle(rotation)
+        self._ua_cycle = itertools.cycle(rotation)
+        
         # Configure retry strategy
         retry_strategy = Retry(
             total=max_retries,
             status_forcelist=[429, 500, 502, 503, 504],
-            method_whitelist=["HEAD", "GET", "OPTIONS"],
+            allowed_methods=frozenset(["HEAD", "GET", "OPTIONS"]),
             backoff_factor=backoff_factor,
-            raise_on_status=False
+            backoff_max=10.0,  # urllib3 otherwise allows up to 120s between retries
+            raise_on_status=False,
+            respect_retry_after_header=True
         )
         
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # Keep enough pooled keep-alive connections for concurrent scrapers hitting the same hosts
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=100,
+            max_retries=retry_strategy,
+            pool_block=False
+        )
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
         
@@ -108,10 +206,12 @@ class RobustSession:
     def get(self, url: str, **kwargs) -> Optional[requests.Response]:
         """Enhanced GET request with error handling"""
         try:
-            # Rotate user agent
-            self.session.headers['User-Agent'] = random.choice(self.user_agents)
+            # Rotate user agent per request rather than on the shared session headers,
+            # so concurrent threads don't overwrite each other's choice
+            headers = {'User-Agent': next(self._ua_cycle)}
+            headers.update(kwargs.pop('headers', None) or {})
             
-            response = self.session.get(url, timeout=self.timeout, **kwargs)
+            response = self.session.get(url, timeout=self.timeout, headers=headers, **kwargs)
             
             if response.status_code == 200:
                 logger.debug(f"Successfully fetched {url}")
@@ -135,131 +235,181 @@ class RobustSession:
         except requests.exceptions.RequestException as e:
             logger.error(f"Request error for {url}: {e}")
             return None
+    
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+_default_session: Optional[RobustSession] = None
+_default_session_lock = threading.Lock()
+
+def get_default_session() -> RobustSession:
+    """Get the process-wide RobustSession, creating it on first use"""
+    global _default_session
+    if _default_session is None:
+        with _default_session_lock:
+            if _default_session is None:
+                _default_session = RobustSession()
+    return _default_session
+
+@functools.lru_cache(maxsize=8192)
+def _parse(url: str) -> tuple:
+    """Parse a URL into (scheme, lowercased netloc, netloc without www.), cached for repeat lookups"""
+    parsed = urlparse(url)
+    netloc = parsed.netloc.lower()
+    domain = netloc[4:] if netloc[:4] == 'www.' else netloc
+    return parsed.scheme, netloc, domain
 
 def validate_url(url: str) -> bool:
     """Validate if a URL is properly formatted"""
+    if not isinstance(url, str):
+        return False
     try:
-        from urllib.parse import urlparse
-        result = urlparse(url)
-        return all([result.scheme, result.netloc])
-    except Exception:
+        scheme, netloc, _ = _parse(url)
+        return bool(scheme and netloc)
+    except ValueError:  # Malformed URL, e.g. a bad IPv6 host
         return False
 
 def safe_extract_text(element, default: str = "") -> str:
     """Safely extract text from BeautifulSoup element"""
-    try:
-        if element:
-            return element.get_text().strip()
-        return default
-    except Exception:
+    # Look the method up instead of catching errors; also covers element being None
+    get_text = getattr(element, 'get_text', None)
+    if get_text is None:
         return default
+    return get_text().strip()
 
 def safe_extract_attribute(element, attribute: str, default: str = "") -> str:
     """Safely extract attribute from BeautifulSoup element"""
-    try:
-        if element:
-            return element.get(attribute, default)
-        return default
-    except Exception:
+    get = getattr(element, 'get', None)
+    if get is None:
         return default
+    return get(attribute, default)
 
 def normalize_domain(url: str) -> str:
     """Extract and normalize domain from URL"""
+    # urlparse also accepts bytes (and None), and would hand back a bytes domain
+    if not isinstance(url, str):
+        return ""
     try:
-        from urllib.parse import urlparse
-        parsed = urlparse(url)
-        domain = parsed.netloc.lower()
-        # Remove www prefix
-        if domain.startswith('www.'):
-            domain = domain[4:]
-        return domain
-    except Exception:
+        return _parse(url)[2]
+    except ValueError:  # Malformed URL, e.g. a bad IPv6 host
         return ""
 
 def is_valid_email(email: str) -> bool:
     """Basic email validation"""
-    import re
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
+    return _EMAIL_RE.match(email) is not None
 
 def clean_text(text: str) -> str:
     """Clean and normalize text content"""
     if not text:
         return ""
     
-    # Remove extra whitespace
-    text = ' '.join(text.split())
-    
-    # Remove special characters but keep basic punctuation
-    import re
-    text = re.sub(r'[^\w\s\.,!?;:\-()[\]{}"\']', '', text)
-    
-    return text.strip()
+    # Remove special characters, then collapse whitespace (split/join also strips the ends)
+    return ' '.join(text.translate(_DEL_TABLE).split())
+
+def _elapsed_since(timestamp: str, now: float) -> timedelta:
+    """Time from an ISO timestamp to the epoch time now"""
+    try:
+        return timedelta(seconds=now - datetime.fromisoformat(timestamp).timestamp())
+    except (ValueError, TypeError):
+        return _LARGE_DELTA  # Return large difference if parsing fails
 
 def calculate_time_difference(timestamp: str) -> timedelta:
     """Calculate time difference from ISO timestamp to now"""
-    try:
-        past_time = datetime.fromisoformat(timestamp)
-        return datetime.now() - past_time
-    except Exception:
-        return timedelta(days=999)  # Return large difference if parsing fails
+    return _elapsed_since(timestamp, time.time())
+
+def calculate_time_differences(timestamps: List[str]) -> List[timedelta]:
+    """Calculate time differences for many ISO timestamps against a single reading of now"""
+    now = time.time()
+    return [_elapsed_since(timestamp, now) for timestamp in timestamps]
 
 class DataValidator:
     """Utility class for validating scraped data"""
     
-    @staticmethod
-    def validate_keyword_data(data: dict) -> bool:
+    __slots__ = ()
+    
+    _KEYWORD_FIELDS = frozenset(('keyword', 'search_volume', 'competition', 'difficulty_score'))
+    _CONTENT_FIELDS = frozenset(('title', 'url', 'word_count'))
+    _SEO_FIELDS = frozenset(('url', 'page_title', 'h1_count', 'page_load_time'))
+    
+    @classmethod
+    def validate_keyword_data(cls, data: dict) -> bool:
         """Validate keyword data structure"""
-        required_fields = ['keyword', 'search_volume', 'competition', 'difficulty_score']
-        return all(field in data for field in required_fields)
+        return cls._KEYWORD_FIELDS <= data.keys()
     
-    @staticmethod
-    def validate_content_data(data: dict) -> bool:
+    @classmethod
+    def validate_content_data(cls, data: dict) -> bool:
         """Validate content data structure"""
-        required_fields = ['title', 'url', 'word_count']
-        return all(field in data for field in required_fields)
+        return cls._CONTENT_FIELDS <= data.keys()
     
-    @staticmethod
-    def validate_technical_seo_data(data: dict) -> bool:
+    @classmethod
+    def validate_technical_seo_data(cls, data: dict) -> bool:
         """Validate technical SEO data structure"""
-        required_fields = ['url', 'page_title', 'h1_count', 'page_load_time']
-        return all(field in data for field in required_fields)
+        return cls._SEO_FIELDS <= data.keys()
 
 # Performance monitoring utilities
 class PerformanceMonitor:
     """Monitor and log performance metrics"""
     
+    __slots__ = ('metrics', '_lock')
+    
     def __init__(self):
-        self.start_time = None
         self.metrics = {}
+        self._lock = threading.Lock()
     
     def start_timer(self, operation: str):
         """Start timing an operation"""
-        self.start_time = time.time()
-        self.metrics[operation] = {'start': self.start_time}
+        with self._lock:
+            self.metrics[operation] = {'start': time.perf_counter()}
     
     def end_timer(self, operation: str):
         """End timing and log results"""
-        if operation in self.metrics and self.start_time:
-            duration = time.time() - self.start_time
-            self.metrics[operation]['duration'] = duration
-            logger.info(f"Operation '{operation}' completed in {duration:.2f} seconds")
-            return duration
-        return 0
+        with self._lock:
+            entry = self.metrics.get(operation)
+            if entry is None or 'start' not in entry:
+                return 0
+            duration = time.perf_counter() - entry['start']
+            entry['duration'] = duration
+        logger.info(f"Operation '{operation}' completed in {duration:.2f} seconds")
+        return duration
+    
+    @contextmanager
+    def timer(self, operation: str):
+        """Time the body of a with block as one operation"""
+        self.start_timer(operation)
+        try:
+            yield
+        finally:
+            self.end_timer(operation)
     
     def get_metrics(self) -> dict:
         """Get all recorded metrics"""
-        return self.metrics.copy()
+        with self._lock:
+            return {operation: entry.copy() for operation, entry in self.metrics.items()}
 
 # Memory usage monitoring
+def _current_process():
+    """psutil handle for this process, rebuilt if the pid changed after a fork"""
+    global _process
+    if _process is None or _process.pid != os.getpid():
+        _process = psutil.Process()
+    return _process
+
 def log_memory_usage(func: Callable) -> Callable:
     """Decorator to log memory usage of a function"""
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        import psutil
-        import os
+        # Only pay for the RSS reads when the debug line will actually be emitted
+        if psutil is None or not logger.isEnabledFor(logging.DEBUG):
+            return func(*args, **kwargs)
         
-        process = psutil.Process(os.getpid())
+        process = _current_process()
         mem_before = process.memory_info().rss / 1024 / 1024  # MB
         
         result = func(*args, **kwargs)